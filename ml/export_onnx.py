@@ -0,0 +1,58 @@
+"""
+Railway Issue Model - ONNX Export
+=================================
+Convert the trained Keras model to ONNX so inference can run on ONNX Runtime
+instead of TensorFlow. Run once after training:
+
+    python ml/export_onnx.py
+"""
+
+import os
+import argparse
+
+# Default paths (same layout as train_railway_model.py / predict.py)
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "railway_issue_model.h5")
+ONNX_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "railway_issue_model.onnx")
+
+ONNX_OPSET = 13
+
+
+def export_onnx(model_or_path=None, onnx_path=None, opset=ONNX_OPSET):
+    """
+    Export a Keras model (or a saved model file) to ONNX.
+    Returns the path of the written .onnx file.
+    """
+    import tensorflow as tf
+    import tf2onnx
+
+    onnx_path = onnx_path or ONNX_PATH
+    model = model_or_path or MODEL_PATH
+    if isinstance(model, str):
+        model = tf.keras.models.load_model(model, compile=False)
+
+    # Dynamic batch dimension, fixed spatial size from the trained model
+    input_signature = (
+        tf.TensorSpec((None, *model.input_shape[1:]), tf.float32, name="input"),
+    )
+    tf2onnx.convert.from_keras(
+        model,
+        input_signature=input_signature,
+        opset=opset,
+        output_path=onnx_path,
+    )
+    return onnx_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export trained Keras model to ONNX")
+    parser.add_argument("--model", type=str, default=MODEL_PATH, help="Path to trained Keras model")
+    parser.add_argument("--output", type=str, default=ONNX_PATH, help="Output .onnx path")
+    parser.add_argument("--opset", type=int, default=ONNX_OPSET, help="ONNX opset version")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print("Error: Model not found. Train first with: python ml/train_railway_model.py")
+        exit(1)
+
+    path = export_onnx(args.model, args.output, args.opset)
+    print(f"[OK] ONNX model saved to: {path}")
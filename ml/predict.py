@@ -7,78 +7,485 @@ Ready for integration into Flask backend as alternative to Gemini.
 
 import os
 import json
+import time
+import queue
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 import numpy as np
-from PIL import Image
 
-# Default paths
-MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "railway_issue_model.h5")
-CLASSES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "railway_model_classes.json")
+# Default paths (ML_MODEL_PATH / ML_CLASSES_PATH override, same as server/config.py)
+MODEL_PATH = os.getenv(
+    "ML_MODEL_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "railway_issue_model.h5")
+)
+CLASSES_PATH = os.getenv(
+    "ML_CLASSES_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "railway_model_classes.json")
+)
+ONNX_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "railway_issue_model.onnx")
 
-# Model input size (must match training)
+# Inference backend: auto (ONNX if exported, else Keras) | onnx | keras | trt
+ML_BACKEND = os.getenv("ML_BACKEND", "auto")
+# ML_QUANT=int8 serves the INT8 ONNX model from ml/quantize.py (CPU-dependent speedup)
+ML_QUANT = os.getenv("ML_QUANT", "")
+# Keras backend: XLA-compile the forward pass (ML_XLA=0 runs it uncompiled)
+ML_XLA = os.getenv("ML_XLA", "1") == "1"
+
+# Model input size (must match training). Default for EfficientNetB3; models trained with
+# another backbone (train_railway_model.py --backbone) are resized to their own input shape.
 IMG_SIZE = (300, 300)
 
+# Batch inference: images per forward pass / threads for Pillow decode+resize
+BATCH_SIZE = 16
+PREPROCESS_WORKERS = min(8, os.cpu_count() or 1)
+
+# Process-wide (model, class_names, class_indices), loaded once and warmed up
+_MODEL = None
+_LOCK = threading.Lock()
+
+# tf.function for decode + resize inside the TF graph (Keras models only), built on first use
+_TF_PREPROCESS = None
+
+# id(keras model) -> (forward callable, XLA-compiled?) (compiled tf.function unless ML_XLA=0)
+_KERAS_FORWARD = {}
+
+# XLA compiles once per input shape: batches are zero-padded up to one of these sizes (all
+# compiled during warm-up), so the batcher / predict_many never trigger a compile mid-request.
+XLA_BATCH_BUCKETS = tuple(b for b in (1, 2, 4, 8, 16, 32, 64) if b <= BATCH_SIZE)
+
+
+def _onnx_path_for(model_path):
+    """ONNX export written alongside the Keras model (see ml/export_onnx.py, ml/quantize.py)."""
+    base = os.path.splitext(model_path)[0]
+    if ML_QUANT.lower() == "int8" and os.path.exists(base + ".int8.onnx"):
+        return base + ".int8.onnx"
+    return base + ".onnx"
+
+
+def _load_onnx_session(onnx_path):
+    """Create an ONNX Runtime session. Returns None if onnxruntime is missing."""
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        return None
+    available = ort.get_available_providers()
+    providers = [p for p in ("CUDAExecutionProvider", "CPUExecutionProvider") if p in available]
+    return ort.InferenceSession(onnx_path, providers=providers)
+
+
+def _is_onnx_session(model):
+    return hasattr(model, "get_inputs") and hasattr(model, "run")
+
 
-def load_model_and_classes(model_path=None, classes_path=None):
+class TrtModel:
     """
-    Load trained model and class mapping.
-    Returns (model, class_names, class_indices) or (None, [], {}) if not found.
+    TensorRT engine (batch size 1) with pinned host / device buffers reused across calls.
+    Uses the named-tensor API (TensorRT 8.5+; the binding-index API is gone in TensorRT 10).
+    The single execution context and its buffers are shared by all request threads, so calls
+    are serialized with a lock, and each call makes the engine's CUDA context current on the
+    calling thread. Build the engine once from the ONNX export:
+        trtexec --onnx=railway_issue_model.onnx --fp16 --saveEngine=railway_issue_model.plan
     """
-    model_path = model_path or MODEL_PATH
-    classes_path = classes_path or CLASSES_PATH
 
-    if not os.path.exists(model_path) or not os.path.exists(classes_path):
-        return None, [], {}
+    def __init__(self, engine_path):
+        import tensorrt as trt
+        import pycuda.driver as cuda
+
+        cuda.init()
+        self._cuda = cuda
+        # Device 0's primary context, pushed around every use instead of bound to this thread
+        self._ctx = cuda.Device(0).retain_primary_context()
+        self._lock = threading.Lock()
+        self._ctx.push()
+        try:
+            logger = trt.Logger(trt.Logger.WARNING)
+            with open(engine_path, "rb") as f:
+                self.engine = trt.Runtime(logger).deserialize_cuda_engine(f.read())
+            if self.engine is None:
+                raise RuntimeError(f"could not deserialize TensorRT engine {engine_path}")
+            self.context = self.engine.create_execution_context()
+            self.stream = cuda.Stream()
+
+            # One image input (N, H, W, 3) and one softmax output
+            names = [self.engine.get_tensor_name(i) for i in range(self.engine.num_io_tensors)]
+            inputs = [n for n in names if self.engine.get_tensor_mode(n) == trt.TensorIOMode.INPUT]
+            self.input_name = inputs[0]
+            self.output_name = next(n for n in names if n not in inputs)
+            self.input_shape = (1, *tuple(self.engine.get_tensor_shape(self.input_name))[1:])
+            self.context.set_input_shape(self.input_name, self.input_shape)  # pins a dynamic batch to 1
+            self.input_dtype = trt.nptype(self.engine.get_tensor_dtype(self.input_name))
+            output_dtype = trt.nptype(self.engine.get_tensor_dtype(self.output_name))
+            output_shape = tuple(self.context.get_tensor_shape(self.output_name))
 
+            self.host_in = cuda.pagelocked_empty(self.input_shape, self.input_dtype)
+            self.host_out = cuda.pagelocked_empty(output_shape, output_dtype)
+            self.dev_in = cuda.mem_alloc(self.host_in.nbytes)
+            self.dev_out = cuda.mem_alloc(self.host_out.nbytes)
+            self.context.set_tensor_address(self.input_name, int(self.dev_in))
+            self.context.set_tensor_address(self.output_name, int(self.dev_out))
+        finally:
+            self._ctx.pop()
+
+    def infer(self, x):
+        """Run one preprocessed image (1, H, W, 3); returns (1, num_classes) float32 probabilities."""
+        cuda = self._cuda
+        with self._lock:
+            self._ctx.push()
+            try:
+                np.copyto(self.host_in, x, casting="unsafe")
+                cuda.memcpy_htod_async(self.dev_in, self.host_in, self.stream)
+                self.context.execute_async_v3(self.stream.handle)
+                cuda.memcpy_dtoh_async(self.host_out, self.dev_out, self.stream)
+                self.stream.synchronize()
+                # astype copies: the pinned buffer is reused by the next call
+                return self.host_out.astype(np.float32)
+            finally:
+                self._ctx.pop()
+
+
+def _load_trt_model(engine_path):
+    """Load a serialized TensorRT engine. Returns None (caller falls back to ONNX/Keras) on any failure."""
     try:
+        return TrtModel(engine_path)
+    except Exception as e:
+        print(f"[WARN] TensorRT engine not loaded, falling back to ONNX/Keras: {e}")
+        return None
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _newest(*paths):
+    """Most recently written of the existing paths (None if none exist)."""
+    existing = [(_mtime(p), p) for p in paths]
+    existing = [(m, p) for m, p in existing if m is not None]
+    return max(existing)[1] if existing else None
+
+
+def _is_current(artifact, source):
+    """True if the exported artifact exists and is not older than the Keras model it came from."""
+    artifact_mtime = _mtime(artifact)
+    if artifact_mtime is None:
+        return False
+    source_mtime = _mtime(source) if source else None
+    if source_mtime is not None and artifact_mtime < source_mtime:
+        print(f"[WARN] {artifact} is older than {source}; ignoring it (re-export after retraining)")
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=2)
+def _cached_load(model_path, classes_path, backend):
+    """
+    Load (model, class_names, class_indices) once per (paths, backend).
+    Raises on failure so a missing/broken model is not cached and can be retried after training.
+    """
+    onnx_path = _onnx_path_for(model_path)
+    engine_path = os.path.splitext(model_path)[0] + ".plan"
+    keras_path = os.path.splitext(model_path)[0] + ".keras"
+
+    if not os.path.exists(classes_path):
+        raise FileNotFoundError(classes_path)
+    if not any(os.path.exists(p) for p in (model_path, keras_path, onnx_path, engine_path)):
+        raise FileNotFoundError(model_path)
+
+    # Newest Keras save: a leftover .keras must not shadow a newer .h5 (or vice versa)
+    keras_src = _newest(keras_path, model_path)
+    model = None
+    if backend == "trt" and _is_current(engine_path, keras_src):
+        model = _load_trt_model(engine_path)
+    if model is None and backend != "keras" and _is_current(onnx_path, keras_src):
+        model = _load_onnx_session(onnx_path)
+    if model is None:
         from tensorflow import keras
 
-        model = keras.models.load_model(model_path)
-        with open(classes_path) as f:
-            data = json.load(f)
-        class_names = data["classes"]
-        class_indices = data["indices"]
-        return model, class_names, class_indices
+        # No optimizer needed for inference
+        model = keras.models.load_model(keras_src or model_path, compile=False)
+    with open(classes_path) as f:
+        data = json.load(f)
+    return model, data["classes"], data["indices"]
+
+
+def load_model_and_classes(model_path=None, classes_path=None, backend=None):
+    """
+    Load trained model and class mapping (memoized per paths + backend).
+    backend: 'auto' (ONNX export if present, else Keras) | 'onnx' | 'keras' | 'trt'.
+    The Keras path loads the newer of model_path and the .keras file next to it; .onnx/.plan
+    exports older than that Keras model are ignored (stale after retraining) with a warning.
+    'trt' loads the TensorRT engine (.plan) next to the model and falls back to 'auto'.
+    Returns (model, class_names, class_indices) or (None, [], {}) if not found.
+    """
+    model_path = model_path or MODEL_PATH
+    classes_path = classes_path or CLASSES_PATH
+    backend = (backend or ML_BACKEND).lower()
+    try:
+        return _cached_load(model_path, classes_path, backend)
+    except FileNotFoundError:
+        return None, [], {}
     except Exception as e:
         print(f"[WARN] Could not load ML model: {e}")
         return None, [], {}
 
 
-def preprocess_image(image_input):
+load_model_and_classes.cache_clear = _cached_load.cache_clear
+
+
+def _input_size(model):
+    """(H, W) the model was trained at, read from its input shape; IMG_SIZE if unknown."""
+    if _is_onnx_session(model):
+        shape = model.get_inputs()[0].shape
+    else:
+        shape = getattr(model, "input_shape", None)
+    try:
+        return int(shape[1]), int(shape[2])
+    except (TypeError, ValueError, IndexError):
+        return IMG_SIZE
+
+
+def preprocess_image(image_input, img_size=IMG_SIZE):
     """
     Preprocess image for model input.
-    Accepts: file path (str), PIL Image, numpy array (HWC, 0-255), or bytes.
+    Accepts: file path (str), PIL Image, numpy array (HWC, 0-255), bytes, or a binary
+    file object (e.g. an upload stream; read from its current position).
+    Returns a (1, H, W, 3) float32 array scaled to [0, 1].
     """
+    from PIL import Image
+
     if isinstance(image_input, str):
-        img = Image.open(image_input).convert("RGB")
+        img = Image.open(image_input)
     elif isinstance(image_input, Image.Image):
-        img = image_input.convert("RGB")
+        img = image_input
     elif isinstance(image_input, np.ndarray):
-        img = Image.fromarray(image_input.astype(np.uint8)).convert("RGB")
+        img = Image.fromarray(image_input.astype(np.uint8, copy=False))
     elif isinstance(image_input, bytes):
         from io import BytesIO
-        img = Image.open(BytesIO(image_input)).convert("RGB")
+        img = Image.open(BytesIO(image_input))
+    elif hasattr(image_input, "read"):
+        img = Image.open(image_input)
     else:
-        raise ValueError("image_input must be path, PIL Image, numpy array, or bytes")
+        raise ValueError("image_input must be path, PIL Image, numpy array, bytes, or file object")
+
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    img = img.resize(img_size[::-1], Image.BILINEAR)
+    # uint8 -> float32 in place (no float64 intermediate)
+    arr = np.asarray(img, dtype=np.uint8).astype(np.float32)
+    np.multiply(arr, np.float32(1.0 / 255.0), out=arr)
+    return arr[None, ...]
+
+
+def _is_keras_model(model):
+    return not _is_onnx_session(model) and not isinstance(model, TrtModel)
 
-    img = img.resize(IMG_SIZE)
-    arr = np.array(img) / 255.0
-    return np.expand_dims(arr, axis=0)
+
+def _tf_preprocess(image_input, img_size):
+    """
+    Decode + resize bytes or a file path with TF ops, so the work runs in the same runtime
+    (and device) as a Keras model. Returns a (1, H, W, 3) float32 tensor, or None if TF
+    can't decode the format (e.g. WebP) and the PIL path should be used instead.
+    """
+    global _TF_PREPROCESS
+    import tensorflow as tf
+
+    if _TF_PREPROCESS is None:
+        @tf.function
+        def _pp(data, size):
+            img = tf.io.decode_image(data, channels=3, expand_animations=False)
+            img = tf.image.resize(img, size, method="bilinear")
+            return tf.cast(img, tf.float32)[None] * (1.0 / 255.0)
+
+        _TF_PREPROCESS = _pp
+    try:
+        data = tf.io.read_file(image_input) if isinstance(image_input, str) else tf.constant(image_input)
+        return _TF_PREPROCESS(data, tf.constant(img_size))
+    except (tf.errors.InvalidArgumentError, tf.errors.NotFoundError):
+        return None
+
+
+def _infer(model, x):
+    """Run a preprocessed batch through the model; returns class probabilities (N, num_classes)."""
+    if _is_onnx_session(model):
+        inp = model.get_inputs()[0].name
+        out = model.get_outputs()[0].name
+        return model.run([out], {inp: x.astype(np.float32, copy=False)})[0]
+    if isinstance(model, TrtModel):
+        return model.infer(x)
+    import tensorflow as tf
+
+    # Direct call: skips Model.predict's per-call dataset/callback setup (much cheaper for small batches)
+    fwd, compiled = _keras_forward(model)
+    if not compiled:
+        return np.asarray(fwd(tf.convert_to_tensor(x, dtype=tf.float32)))
+    n, largest = len(x), XLA_BATCH_BUCKETS[-1]
+    if n > largest:
+        return np.concatenate([_infer(model, x[i:i + largest]) for i in range(0, n, largest)], axis=0)
+    bucket = next(b for b in XLA_BATCH_BUCKETS if b >= n)
+    if bucket > n:
+        x = np.asarray(x, dtype=np.float32)
+        x = np.concatenate([x, np.zeros((bucket - n, *x.shape[1:]), np.float32)])
+    return np.asarray(fwd(tf.convert_to_tensor(x, dtype=tf.float32)))[:n]
+
+
+def _keras_forward(model):
+    """
+    (forward pass, compiled?) for a Keras model, built once: tf.function(jit_compile=True)
+    fuses the graph with XLA.
+    """
+    entry = _KERAS_FORWARD.get(id(model))
+    if entry is None:
+        def call(x):
+            return model(x, training=False)
+
+        if ML_XLA:
+            import tensorflow as tf
+            entry = (tf.function(call, jit_compile=True, reduce_retracing=True), True)
+        else:
+            entry = (call, False)
+        _KERAS_FORWARD[id(model)] = entry
+    return entry
+
+
+def _warmup(model):
+    """
+    Dummy inference so kernel selection / graph tracing (and XLA compilation for Keras, once
+    per XLA_BATCH_BUCKETS size) happens before the first request. Falls back to the
+    uncompiled Keras call if XLA fails.
+    """
+    xla = ML_XLA and _is_keras_model(model)
+    for n in (XLA_BATCH_BUCKETS if xla else (1,)):
+        x = np.zeros((n, *_input_size(model), 3), dtype=np.float32)
+        try:
+            _infer(model, x)
+        except Exception as e:
+            if not xla:
+                raise
+            print(f"[WARN] XLA compilation failed, using the uncompiled Keras forward pass: {e}")
+            _KERAS_FORWARD[id(model)] = (lambda t: model(t, training=False), False)
+            _infer(model, x[:1])
+            return
+
+
+def _get_model(model_path=None, classes_path=None):
+    """
+    Thread-safe lazy singleton: load the model once per process and warm it up.
+    Returns (model, class_names, class_indices); model is None if not trained yet.
+    """
+    global _MODEL
+    if _MODEL is not None:
+        return _MODEL
+    with _LOCK:
+        if _MODEL is None:
+            loaded = load_model_and_classes(model_path, classes_path)
+            if loaded[0] is None:
+                return loaded
+            _warmup(loaded[0])
+            _MODEL = loaded
+    return _MODEL
 
 
 def predict(image_input, model=None, class_names=None):
     """
     Predict railway issue category from image.
-    Returns: (class_name, confidence, all_probs_dict)
+    Returns: (class_name, confidence, probs) where probs is the per-class ndarray
+    (build a class -> probability dict only where the full distribution is needed).
+    """
+    if model is None or not class_names:
+        model, class_names, _ = _get_model()
+    if model is None:
+        return None, 0.0, None
+
+    img_size = _input_size(model)
+    x = None
+    if _is_keras_model(model) and isinstance(image_input, (bytes, str)):
+        x = _tf_preprocess(image_input, img_size)
+    if x is None:
+        x = preprocess_image(image_input, img_size)
+    return _top1(_infer(model, x)[0], class_names)
+
+
+def predict_many(image_inputs, model=None, class_names=None, batch_size=BATCH_SIZE):
+    """
+    Predict categories for many images in batched forward passes.
+    Preprocessing runs in a thread pool (Pillow releases the GIL while decoding/resizing).
+    Returns: list of (class_name, confidence, probs ndarray), in input order.
     """
+    image_inputs = list(image_inputs)
+    if not image_inputs:
+        return []
     if model is None or not class_names:
-        model, class_names, _ = load_model_and_classes()
+        model, class_names, _ = _get_model()
     if model is None:
-        return None, 0.0, {}
+        return [(None, 0.0, None) for _ in image_inputs]
+
+    img_size = _input_size(model)
+    with ThreadPoolExecutor(max_workers=PREPROCESS_WORKERS) as ex:
+        x = np.concatenate(list(ex.map(lambda i: preprocess_image(i, img_size), image_inputs)), axis=0)
+
+    return [_top1(p, class_names) for p in _infer_batch(model, x, batch_size)]
+
+
+def _infer_batch(model, x, batch_size=BATCH_SIZE):
+    """_infer over a stacked batch in chunks of batch_size (1 for the TensorRT engine)."""
+    step = 1 if isinstance(model, TrtModel) else batch_size
+    return np.concatenate([_infer(model, x[i:i + step]) for i in range(0, len(x), step)], axis=0)
+
+
+def _top1(probs, class_names):
+    idx = int(np.argmax(probs))
+    return class_names[idx], probs[idx].item(), probs
+
+
+class InferenceBatcher:
+    """
+    Micro-batching for concurrent single-image requests: callers preprocess in their own
+    thread and enqueue; one background thread collects up to max_batch inputs (waiting at
+    most latency_ms after the first) and runs them through the model in a single forward pass.
+    Create it in the serving process (threads don't survive a fork, e.g. gunicorn --preload).
+    """
+
+    def __init__(self, model, class_names, max_batch=BATCH_SIZE, latency_ms=10):
+        self.model = model
+        self.class_names = class_names
+        self.max_batch = max_batch
+        self.latency = latency_ms / 1000.0
+        self.img_size = _input_size(model)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, image_input):
+        """Enqueue one image (path, bytes, file object, PIL, array); returns a Future of (class_name, confidence, probs)."""
+        future = Future()
+        self._queue.put((preprocess_image(image_input, self.img_size), future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.latency
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
 
-    x = preprocess_image(image_input)
-    probs = model.predict(x, verbose=0)[0]
-    idx = np.argmax(probs)
-    return class_names[idx], float(probs[idx]), dict(zip(class_names, probs.tolist()))
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                probs = _infer_batch(self.model, np.concatenate([x for x, _ in batch], axis=0), self.max_batch)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), p in zip(batch, probs):
+                future.set_result(_top1(p, self.class_names))
 
 
 if __name__ == "__main__":
@@ -88,11 +495,11 @@ if __name__ == "__main__":
     parser.add_argument("image", type=str, help="Path to image file")
     args = parser.parse_args()
 
-    model, class_names, _ = load_model_and_classes()
+    model, class_names, _ = _get_model()
     if model is None:
         print("Error: Model not found. Train first with: python ml/train_railway_model.py")
         exit(1)
 
     category, confidence, probs = predict(args.image, model, class_names)
     print(f"Prediction: {category} ({confidence:.2%})")
-    print("All classes:", {k: f"{v:.2%}" for k, v in probs.items()})
+    print("All classes:", {k: f"{v:.2%}" for k, v in zip(class_names, probs.tolist())})
@@ -0,0 +1,106 @@
+"""
+Railway Issue Model - INT8 Quantization
+=======================================
+Post-training static INT8 quantization of the ONNX export using a small
+calibration set drawn from the training images. Run after export_onnx.py:
+
+    python ml/quantize.py
+
+Serve the result with ML_QUANT=int8. INT8 speedups depend on the CPU
+(AVX-VNNI / ARM dot-product); benchmark before enabling in production.
+"""
+
+import os
+import random
+import argparse
+
+from predict import IMG_SIZE, ONNX_PATH, preprocess_image
+
+INT8_ONNX_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "railway_issue_model.int8.onnx")
+NUM_CALIBRATION_IMAGES = 100
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".jfif")
+
+
+def _calibration_files(train_dir, limit=NUM_CALIBRATION_IMAGES, seed=42):
+    """Pick up to `limit` images spread across the class subfolders."""
+    files = []
+    for name in sorted(os.listdir(train_dir)):
+        path = os.path.join(train_dir, name)
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, f) for f in sorted(os.listdir(path)) if f.lower().endswith(IMAGE_EXTENSIONS)
+            )
+    random.Random(seed).shuffle(files)
+    return files[:limit]
+
+
+def _input_size(graph_input):
+    """(H, W) from the ONNX input shape (N, H, W, 3); IMG_SIZE if the dims are symbolic."""
+    dims = graph_input.type.tensor_type.shape.dim
+    if len(dims) == 4 and dims[1].dim_value and dims[2].dim_value:
+        return dims[1].dim_value, dims[2].dim_value
+    return IMG_SIZE
+
+
+def _make_calibration_reader(train_dir, input_name, img_size=IMG_SIZE, limit=NUM_CALIBRATION_IMAGES):
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class RailwayCalib(CalibrationDataReader):
+        """Feeds preprocessed training images to the static quantization calibrator."""
+
+        def __init__(self):
+            self._files = iter(_calibration_files(train_dir, limit))
+
+        def get_next(self):
+            path = next(self._files, None)
+            if path is None:
+                return None
+            return {input_name: preprocess_image(path, img_size)}
+
+    return RailwayCalib()
+
+
+def quantize_int8(train_dir, model_input=None, model_output=None):
+    """Quantize the FP32 ONNX model to INT8 (QDQ, per-channel). Returns the output path."""
+    import onnx
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+    model_input = model_input or ONNX_PATH
+    model_output = model_output or INT8_ONNX_PATH
+
+    graph = onnx.load(model_input).graph
+    input_name = graph.input[0].name
+    # Calibrate at the model's own input size (224px for mbv2, 300px for b3)
+    img_size = _input_size(graph.input[0])
+    # Keep the softmax head in FP32; requantizing its output costs more than it saves
+    softmax_nodes = [n.name for n in graph.node if n.op_type == "Softmax"]
+
+    quantize_static(
+        model_input=model_input,
+        model_output=model_output,
+        calibration_data_reader=_make_calibration_reader(train_dir, input_name, img_size),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QInt8,
+        weight_type=QuantType.QInt8,
+        nodes_to_exclude=softmax_nodes,
+    )
+    return model_output
+
+
+if __name__ == "__main__":
+    from train_railway_model import get_train_directory
+
+    parser = argparse.ArgumentParser(description="INT8-quantize the ONNX railway issue model")
+    parser.add_argument("--train-dir", type=str, default=None, help="Calibration images (class subfolders)")
+    parser.add_argument("--model", type=str, default=ONNX_PATH, help="FP32 .onnx input")
+    parser.add_argument("--output", type=str, default=INT8_ONNX_PATH, help="INT8 .onnx output")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print("Error: ONNX model not found. Export first with: python ml/export_onnx.py")
+        exit(1)
+
+    train_dir = args.train_dir or get_train_directory()
+    path = quantize_int8(train_dir, args.model, args.output)
+    print(f"[OK] INT8 model saved to: {path}")
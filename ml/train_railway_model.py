@@ -9,15 +9,16 @@ This model is an offline-trained alternative to Gemini Vision AI.
 import os
 import json
 import argparse
+import functools
 from datetime import datetime
 
 import numpy as np
 import tensorflow as tf
+from PIL import Image
 from tensorflow import keras
 from sklearn.utils.class_weight import compute_class_weight
-from tensorflow.keras import layers, Model
-from tensorflow.keras.applications import EfficientNetB3
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
+from tensorflow.keras import layers, Model, mixed_precision
+from tensorflow.keras.applications import EfficientNetB3, MobileNetV2
 from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau, ModelCheckpoint
 
 # =============================================================================
@@ -31,17 +32,26 @@ FALLBACK_TRAIN_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "s
 # Model hyperparameters (optimized for accuracy)
 IMG_SIZE = (300, 300)  # EfficientNetB3 default input
 BATCH_SIZE = 16
+GPU_BATCH_SIZE = 32  # fits with mixed precision (halved activation memory)
 INITIAL_EPOCHS = 20  # Phase 1: frozen base
 FINE_TUNE_EPOCHS = 30  # Phase 2: unfrozen fine-tuning
 LEARNING_RATE = 1e-4
 FINE_TUNE_LR = 1e-5
 VALIDATION_SPLIT = 0.2  # Split from train if no val folder
 SEED = 42
+IN_MEMORY_RAM_FRACTION = 0.5  # Preload the dataset when it needs less than this share of RAM
 
 # Output
 MODEL_SAVE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "railway_issue_model.h5")
 CLASS_NAMES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "railway_model_classes.json")
 
+# Backbones: b3 (default, most accurate) or the lighter CPU-serving mbv2
+DEFAULT_BACKBONE = "b3"
+BACKBONE_IMG_SIZES = {
+    "b3": (300, 300),
+    "mbv2": (224, 224),
+}
+
 
 # =============================================================================
 # MODEL CHOICE JUSTIFICATION
@@ -66,21 +76,30 @@ EfficientNetB3 was chosen over ResNet50 and DenseNet121 for the following reason
 """
 
 
-def _count_images(directory):
-    """Count image files in class subfolders."""
+@functools.lru_cache(maxsize=4)
+def _count_images_cached(directory, class_mtimes):
+    """Single os.scandir pass over class subfolders (DirEntry avoids an extra stat per entry)."""
     ext = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".jfif")
     count = 0
-    if not os.path.exists(directory):
-        return 0
-    for name in os.listdir(directory):
-        path = os.path.join(directory, name)
-        if os.path.isdir(path):
-            for f in os.listdir(path):
-                if f.lower().endswith(ext):
-                    count += 1
+    for name, _ in class_mtimes:
+        with os.scandir(os.path.join(directory, name)) as files:
+            count += sum(1 for f in files if f.name.lower().endswith(ext))
     return count
 
 
+def _count_images(directory):
+    """
+    Count image files in class subfolders (symlinked ones included). Memoized on the class
+    folders' names + mtimes: adding or removing an image changes its class folder's mtime.
+    """
+    try:
+        with os.scandir(directory) as entries:
+            class_mtimes = tuple(sorted((e.name, e.stat().st_mtime) for e in entries if e.is_dir()))
+        return _count_images_cached(directory, class_mtimes)
+    except OSError:
+        return 0
+
+
 def get_train_directory():
     """Get training directory - prefer the one that has images."""
     default_count = _count_images(DEFAULT_TRAIN_DIR)
@@ -105,88 +124,223 @@ def get_train_directory():
     )
 
 
-def create_data_generators(train_dir):
+def build_augmentation():
+    """Keras preprocessing layers equivalent to the old ImageDataGenerator augmentation."""
+    return keras.Sequential(
+        [
+            layers.RandomFlip("horizontal"),
+            layers.RandomRotation(30 / 360, fill_mode="nearest"),
+            layers.RandomZoom(0.2, fill_mode="nearest"),
+            layers.RandomTranslation(0.2, 0.2, fill_mode="nearest"),
+            layers.RandomBrightness(0.2),
+        ],
+        name="augmentation",
+    )
+
+
+def _labels_from_paths(file_paths, class_names):
+    """Integer class label for each file, taken from its class subfolder name."""
+    index = {name: i for i, name in enumerate(class_names)}
+    return np.array([index[os.path.basename(os.path.dirname(p))] for p in file_paths], dtype=np.int32)
+
+
+def _augment_and_rescale(augmentation):
+    """Map fn: random augmentation on 0-255 images, then rescale to [0, 1]."""
+    return lambda x, y: (augmentation(x, training=True) / 255.0, y)
+
+
+def _fits_in_memory(num_images, img_size=IMG_SIZE):
+    """True if num_images uint8 HWC images take less than IN_MEMORY_RAM_FRACTION of system RAM."""
+    try:
+        import psutil
+    except ImportError:
+        return False
+    total_bytes = num_images * img_size[0] * img_size[1] * 3
+    return 0 < total_bytes < IN_MEMORY_RAM_FRACTION * psutil.virtual_memory().total
+
+
+def load_all_into_memory(train_dir, img_size=IMG_SIZE):
     """
-    Create train and validation data generators with augmentation.
-    Uses validation_split when no separate val folder exists.
+    Decode and resize every training image once into a single contiguous uint8
+    (N, H, W, 3) array, so epochs read from RAM instead of re-decoding files.
+    Returns (images, labels int32, class_names).
     """
-    # Data augmentation for training - improves generalization
-    train_datagen = ImageDataGenerator(
-        rescale=1.0 / 255,
-        rotation_range=30,
-        width_shift_range=0.2,
-        height_shift_range=0.2,
-        zoom_range=0.2,
-        brightness_range=[0.8, 1.2],
-        horizontal_flip=True,
-        fill_mode="nearest",
-        validation_split=VALIDATION_SPLIT,
+    ext = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".jfif")
+    class_names = sorted(
+        name for name in os.listdir(train_dir) if os.path.isdir(os.path.join(train_dir, name))
+    )
+    paths, labels = [], []
+    for i, name in enumerate(class_names):
+        class_dir = os.path.join(train_dir, name)
+        for f in sorted(os.listdir(class_dir)):
+            if f.lower().endswith(ext):
+                paths.append(os.path.join(class_dir, f))
+                labels.append(i)
+
+    images = np.empty((len(paths), *img_size, 3), dtype=np.uint8)
+    for i, path in enumerate(paths):
+        with Image.open(path) as img:
+            images[i] = np.asarray(img.convert("RGB").resize(img_size[::-1], Image.BILINEAR))
+    return images, np.asarray(labels, dtype=np.int32), class_names
+
+
+def create_in_memory_datasets(train_dir, img_size=IMG_SIZE, batch_size=BATCH_SIZE):
+    """
+    Same contract as create_datasets, but backed by load_all_into_memory.
+    Returns (train_ds, val_ds, class_indices, train_labels, num_val).
+    """
+    images, labels, class_names = load_all_into_memory(train_dir, img_size)
+    num_classes = len(class_names)
+    class_indices = {name: i for i, name in enumerate(class_names)}
+
+    order = np.random.default_rng(SEED).permutation(len(images))
+    num_val = int(len(images) * VALIDATION_SPLIT)
+    val_idx, train_idx = order[:num_val], order[num_val:]
+    train_labels = labels[train_idx]
+
+    def to_float(x, y):
+        return tf.cast(x, tf.float32), tf.one_hot(y, num_classes)
+
+    augmentation = build_augmentation()
+    train_ds = (
+        tf.data.Dataset.from_tensor_slices((images[train_idx], train_labels))
+        .shuffle(len(train_idx), seed=SEED)
+        .batch(batch_size)
+        .map(to_float, num_parallel_calls=tf.data.AUTOTUNE)
+        .map(_augment_and_rescale(augmentation), num_parallel_calls=tf.data.AUTOTUNE)
+        .prefetch(tf.data.AUTOTUNE)
+    )
+    val_ds = (
+        tf.data.Dataset.from_tensor_slices((images[val_idx], labels[val_idx]))
+        .batch(batch_size)
+        .map(to_float, num_parallel_calls=tf.data.AUTOTUNE)
+        .map(lambda x, y: (x / 255.0, y), num_parallel_calls=tf.data.AUTOTUNE)
+        .prefetch(tf.data.AUTOTUNE)
     )
+    return train_ds, val_ds, class_indices, train_labels, num_val
 
-    # Validation: only rescale, no augmentation
-    val_datagen = ImageDataGenerator(rescale=1.0 / 255, validation_split=VALIDATION_SPLIT)
 
-    train_ds = train_datagen.flow_from_directory(
+def create_datasets(train_dir, img_size=IMG_SIZE, batch_size=BATCH_SIZE):
+    """
+    Create train and validation tf.data pipelines with augmentation.
+    Decoding, augmentation and batching run in parallel (AUTOTUNE) and overlap with training.
+    Small datasets are preloaded into RAM (see create_in_memory_datasets).
+    Returns (train_ds, val_ds, class_indices, train_labels, num_val).
+    """
+    if _fits_in_memory(_count_images(train_dir), img_size):
+        print("[INFO] Dataset fits in memory: preloading all images")
+        return create_in_memory_datasets(train_dir, img_size, batch_size)
+
+    train_ds, val_ds = tf.keras.utils.image_dataset_from_directory(
         train_dir,
-        target_size=IMG_SIZE,
-        batch_size=BATCH_SIZE,
-        class_mode="categorical",
-        subset="training",
+        image_size=img_size,
+        batch_size=batch_size,
+        validation_split=VALIDATION_SPLIT,
+        subset="both",
         seed=SEED,
-        shuffle=True,
+        label_mode="categorical",
+    )
+    class_names = train_ds.class_names
+    class_indices = {name: i for i, name in enumerate(class_names)}
+    train_labels = _labels_from_paths(train_ds.file_paths, class_names)
+    num_val = len(val_ds.file_paths)
+
+    # This path is for datasets too large for RAM, so nothing is cached: files are decoded every
+    # epoch. The training file list is reshuffled every epoch *before* decoding (a full shuffle
+    # costs only the paths), instead of image_dataset_from_directory's small post-decode buffer.
+    def load(path, label):
+        img = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        return tf.image.resize(img, img_size, method="bilinear"), tf.one_hot(label, num_classes)
+
+    num_classes = len(class_names)
+    augmentation = build_augmentation()
+    train_ds = (
+        tf.data.Dataset.from_tensor_slices((train_ds.file_paths, train_labels))
+        .shuffle(len(train_labels), seed=SEED, reshuffle_each_iteration=True)
+        .map(load, num_parallel_calls=tf.data.AUTOTUNE)
+        .batch(batch_size)
+        .map(_augment_and_rescale(augmentation), num_parallel_calls=tf.data.AUTOTUNE)
+        .prefetch(tf.data.AUTOTUNE)
     )
 
-    val_ds = val_datagen.flow_from_directory(
-        train_dir,
-        target_size=IMG_SIZE,
-        batch_size=BATCH_SIZE,
-        class_mode="categorical",
-        subset="validation",
-        seed=SEED,
-        shuffle=False,
+    # Validation: only rescale, no augmentation
+    val_ds = (
+        val_ds.map(lambda x, y: (x / 255.0, y), num_parallel_calls=tf.data.AUTOTUNE)
+        .prefetch(tf.data.AUTOTUNE)
     )
 
-    return train_ds, val_ds, train_ds.class_indices
+    return train_ds, val_ds, class_indices, train_labels, num_val
+
+
+def _mbv2_base(input_shape):
+    return MobileNetV2(input_shape=input_shape, include_top=False, weights="imagenet", pooling="avg")
+
+
+def _b3_base(input_shape):
+    return EfficientNetB3(input_shape=input_shape, include_top=False, weights="imagenet", pooling="avg")
 
 
-def build_model(num_classes):
+BACKBONES = {
+    "b3": _b3_base,
+    "mbv2": _mbv2_base,
+}
+
+
+def model_save_paths(backbone):
+    """(model .h5 path, class mapping .json path) for a backbone; b3 keeps the original names."""
+    if backbone == DEFAULT_BACKBONE:
+        return MODEL_SAVE_PATH, CLASS_NAMES_PATH
+    return (
+        MODEL_SAVE_PATH.replace(".h5", f"_{backbone}.h5"),
+        CLASS_NAMES_PATH.replace(".json", f"_{backbone}.json"),
+    )
+
+
+def build_model(num_classes, backbone=DEFAULT_BACKBONE):
     """
-    Build EfficientNetB3-based model with custom classification head.
+    Build a pretrained backbone (ImageNet weights) with custom classification head.
     Phase 1: Base frozen. Phase 2: Base unfrozen for fine-tuning.
     """
-    # Load pretrained EfficientNetB3 (ImageNet weights)
-    base_model = EfficientNetB3(
-        input_shape=(*IMG_SIZE, 3),
-        include_top=False,
-        weights="imagenet",
-        pooling="avg",
-    )
+    input_shape = (*BACKBONE_IMG_SIZES[backbone], 3)
+    base_model = BACKBONES[backbone](input_shape)
 
     # Freeze base model initially
     base_model.trainable = False
 
-    # Custom classification head
-    inputs = keras.Input(shape=(*IMG_SIZE, 3))
-    x = base_model(inputs, training=False)
+    # Custom classification head (inputs are rescaled to [0, 1])
+    inputs = keras.Input(shape=input_shape)
+    x = inputs
+    if backbone == "mbv2":
+        x = layers.Rescaling(2.0, offset=-1.0)(x)  # MobileNetV2 expects [-1, 1]
+    x = base_model(x, training=False)
     x = layers.Dropout(0.3)(x)
     x = layers.Dense(256, activation="relu")(x)
     x = layers.Dropout(0.3)(x)
-    outputs = layers.Dense(num_classes, activation="softmax")(x)
+    # Keep the softmax output in float32 for a numerically stable loss
+    outputs = layers.Dense(num_classes, activation="softmax", dtype="float32")(x)
 
     model = Model(inputs, outputs)
     return model, base_model
 
 
+def make_optimizer(learning_rate):
+    """Adam, wrapped in loss scaling when training in mixed precision."""
+    optimizer = keras.optimizers.Adam(learning_rate=learning_rate)
+    if mixed_precision.global_policy().compute_dtype == "float16":
+        optimizer = mixed_precision.LossScaleOptimizer(optimizer)
+    return optimizer
+
+
 def compile_model(model):
     """Compile with categorical cross-entropy and accuracy metrics."""
     model.compile(
-        optimizer=keras.optimizers.Adam(learning_rate=LEARNING_RATE),
+        optimizer=make_optimizer(LEARNING_RATE),
         loss="categorical_crossentropy",
         metrics=["accuracy"],
     )
 
 
-def get_callbacks():
+def get_callbacks(model_save_path=MODEL_SAVE_PATH):
     """Training callbacks for better convergence and early stopping."""
     return [
         EarlyStopping(
@@ -203,7 +357,7 @@ def get_callbacks():
             verbose=1,
         ),
         ModelCheckpoint(
-            filepath=MODEL_SAVE_PATH.replace(".h5", "_best.h5"),
+            filepath=model_save_path.replace(".h5", "_best.h5"),
             monitor="val_accuracy",
             save_best_only=True,
             verbose=1,
@@ -216,34 +370,51 @@ def main():
     parser.add_argument("--train-dir", type=str, default=None, help="Path to training data")
     parser.add_argument("--epochs", type=int, default=INITIAL_EPOCHS, help="Initial training epochs")
     parser.add_argument("--fine-tune-epochs", type=int, default=FINE_TUNE_EPOCHS, help="Fine-tuning epochs")
-    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Batch size")
+    parser.add_argument(
+        "--batch-size", type=int, default=None,
+        help=f"Batch size (default: {GPU_BATCH_SIZE} on GPU, {BATCH_SIZE} on CPU)",
+    )
     parser.add_argument("--no-fine-tune", action="store_true", help="Skip fine-tuning phase")
+    parser.add_argument(
+        "--backbone", choices=sorted(BACKBONES), default=DEFAULT_BACKBONE,
+        help="b3 (EfficientNetB3, 300px) or mbv2 (MobileNetV2, 224px)",
+    )
     args = parser.parse_args()
 
+    # Mixed precision: float16 compute on GPU (tensor cores); CPU stays float32. Set here, not
+    # at import, so importing helpers (e.g. quantize.py) leaves the global dtype policy alone.
+    has_gpu = bool(tf.config.list_physical_devices("GPU"))
+    if has_gpu:
+        mixed_precision.set_global_policy("mixed_float16")
+    batch_size = args.batch_size or (GPU_BATCH_SIZE if has_gpu else BATCH_SIZE)
+    img_size = BACKBONE_IMG_SIZES[args.backbone]
+    model_save_path, class_names_path = model_save_paths(args.backbone)
+
     # Resolve training directory
     train_dir = args.train_dir or get_train_directory()
     print(f"\n[INFO] Using training data from: {train_dir}")
-    print(f"[INFO] Model will be saved to: {MODEL_SAVE_PATH}\n")
+    print(f"[INFO] Backbone: {args.backbone} ({img_size[0]}x{img_size[1]})")
+    print(f"[INFO] Model will be saved to: {model_save_path}\n")
 
-    # Create data generators
-    train_ds, val_ds, class_indices = create_data_generators(train_dir)
+    # Create tf.data pipelines
+    train_ds, val_ds, class_indices, train_labels, num_val = create_datasets(train_dir, img_size, batch_size)
     num_classes = len(class_indices)
     class_names = list(class_indices.keys())
 
     print(f"[INFO] Classes: {class_names}")
-    print(f"[INFO] Training samples: {train_ds.samples}")
-    print(f"[INFO] Validation samples: {val_ds.samples}")
+    print(f"[INFO] Training samples: {len(train_labels)}")
+    print(f"[INFO] Validation samples: {num_val}")
 
     # Compute class weights to handle imbalance (helps minority classes like dirty_toilet)
-    classes = np.unique(train_ds.classes)
+    classes = np.unique(train_labels)
     weights = compute_class_weight(
-        "balanced", classes=classes, y=train_ds.classes
+        "balanced", classes=classes, y=train_labels
     )
     class_weight = dict(zip(classes, weights))
     print(f"[INFO] Class weights (balanced): {dict(zip(class_names, weights))}\n")
 
     # Build model
-    model, base_model = build_model(num_classes)
+    model, base_model = build_model(num_classes, args.backbone)
     compile_model(model)
     model.summary()
 
@@ -256,7 +427,7 @@ def main():
         train_ds,
         validation_data=val_ds,
         epochs=args.epochs,
-        callbacks=get_callbacks(),
+        callbacks=get_callbacks(model_save_path),
         class_weight=class_weight,
         verbose=1,
     )
@@ -273,7 +444,7 @@ def main():
             layer.trainable = False
 
         model.compile(
-            optimizer=keras.optimizers.Adam(learning_rate=FINE_TUNE_LR),
+            optimizer=make_optimizer(FINE_TUNE_LR),
             loss="categorical_crossentropy",
             metrics=["accuracy"],
         )
@@ -282,19 +453,50 @@ def main():
             train_ds,
             validation_data=val_ds,
             epochs=args.fine_tune_epochs,
-            callbacks=get_callbacks(),
+            callbacks=get_callbacks(model_save_path),
             class_weight=class_weight,
             verbose=1,
         )
 
+    # Every layer records the mixed_float16 policy in its config, and saved / exported models
+    # keep it (fp16 compute on CPU serving: slower and less accurate). Save a float32 rebuild
+    # carrying the trained weights instead (variables are float32 under mixed precision too).
+    serving_model = model
+    if has_gpu:
+        mixed_precision.set_global_policy("float32")
+        serving_model, _ = build_model(num_classes, args.backbone)
+        serving_model.set_weights(model.get_weights())
+
     # Save final model
-    model.save(MODEL_SAVE_PATH)
-    print(f"\n[OK] Model saved to: {MODEL_SAVE_PATH}")
+    serving_model.save(model_save_path)
+    print(f"\n[OK] Model saved to: {model_save_path}")
+    # Native Keras v3 format: faster to load on the serving side than HDF5
+    keras_path = model_save_path.replace(".h5", ".keras")
+    serving_model.save(keras_path)
+    print(f"[OK] Model saved to: {keras_path}")
 
     # Save class names for inference
-    with open(CLASS_NAMES_PATH, "w") as f:
-        json.dump({"classes": class_names, "indices": class_indices}, f, indent=2)
-    print(f"[OK] Class mapping saved to: {CLASS_NAMES_PATH}")
+    with open(class_names_path, "w") as f:
+        json.dump({
+            "classes": class_names,
+            "indices": class_indices,
+            "backbone": args.backbone,
+            "img_size": list(img_size),
+        }, f, indent=2)
+    print(f"[OK] Class mapping saved to: {class_names_path}")
+
+    # Export to ONNX for faster serving (optional: needs tf2onnx)
+    onnx_path = model_save_path.replace(".h5", ".onnx")
+    try:
+        from export_onnx import export_onnx
+        onnx_path = export_onnx(serving_model, onnx_path)
+        print(f"[OK] ONNX model saved to: {onnx_path}")
+    except ImportError:
+        print("[INFO] tf2onnx not installed; skipping ONNX export (pip install tf2onnx)")
+        # The server prefers the .onnx: don't leave the previous model's export behind
+        if os.path.exists(onnx_path):
+            os.remove(onnx_path)
+            print(f"[INFO] Removed stale ONNX export: {onnx_path}")
 
     # Final evaluation
     loss, accuracy = model.evaluate(val_ds)
@@ -1,17 +1,37 @@
 #!/usr/bin/env python3
 """
-Convenience script to run the Flask server
+Convenience script to run the Flask server.
+Production: gunicorn (gthread workers, one per CPU core, app code preloaded in the master).
+Development: FLASK_DEBUG=1 uses the Flask dev server with reloader.
 """
 import os
+import shutil
 import sys
 
-# Add server directory to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'server'))
-
-from app import app
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
+    debug = os.getenv('FLASK_DEBUG') == '1'
     print(f'🚂 Server running on http://localhost:{port}')
     print(f'📸 Ready to process railway complaint images')
-    app.run(host='0.0.0.0', port=port, debug=True)
+
+    gunicorn = shutil.which('gunicorn')
+    if not debug and gunicorn:
+        workers = os.getenv('WEB_CONCURRENCY', str(os.cpu_count() or 1))
+        threads = os.getenv('GUNICORN_THREADS', '4')
+        os.execvp(gunicorn, [
+            'gunicorn',
+            '-k', 'gthread',
+            '-w', workers,
+            '--threads', threads,
+            '-b', f'0.0.0.0:{port}',
+            '--chdir', PROJECT_ROOT,
+            '--preload',
+            'server.app:app',
+        ])
+
+    # Add server directory to path
+    sys.path.insert(0, os.path.join(PROJECT_ROOT, 'server'))
+    from app import app
+    app.run(host='0.0.0.0', port=port, debug=debug, threaded=True)
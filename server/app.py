@@ -1,6 +1,8 @@
-from flask import Flask, jsonify
+from flask import Flask, g, jsonify, request
 import os
 import sys
+import threading
+import logging
 from dotenv import load_dotenv
 
 # Add server directory to path for imports
@@ -10,58 +12,137 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 env_path = os.path.join(project_root, ".env")
 load_dotenv(env_path)
 
-from config import DATABASE_URL
-from extensions import db
+# Request-path code logs through `logging`; WARNING by default keeps per-request INFO off stdout
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "WARNING").upper(),
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+from config import DATABASE_URL, SQLALCHEMY_ENGINE_OPTIONS, MAX_CONTENT_LENGTH, GUEST_EMAIL, STATION_LOOKUP
+from extensions import db, OrjsonProvider
 from routes.complaint import complaint_bp
 from routes.auth import auth_bp
 from routes.location import location_bp
 from routes.ticket import ticket_bp
 from routes.admin import admin_bp
 from routes.ml import ml_bp
+from services.auth_service import decode_access_token
 from services.gemini_service import initialize_gemini
+from services.ml_inference_service import warmup_ml
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URL
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["MAX_CONTENT_LENGTH"] = 10 * 1024 * 1024  # 10MB
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = SQLALCHEMY_ENGINE_OPTIONS
+app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH  # Werkzeug rejects larger bodies before parsing
 
 db.init_app(app)
 
 # Import models so tables are registered
-from models import User, Complaint, ComplaintLocation, TrainDetails  # noqa: E402, F401
+from models import User, Complaint, ComplaintLocation, TrainDetails, Station  # noqa: E402, F401
+
+# PostgreSQL only: trigram GIN indexes for the admin filters' ilike('%...%') predicates,
+# which a btree index cannot serve. (index name, table, column)
+_PG_TRGM_INDEXES = (
+    ("ix_td_train_number_trgm", "train_details", "train_number"),
+    ("ix_cl_nearest_station_trgm", "complaint_locations", "nearest_station"),
+    ("ix_cl_railway_context_trgm", "complaint_locations", "railway_context"),
+)
+
+
+def _ensure_indexes():
+    """create_all skips existing tables; add indexes declared later to existing deployments."""
+    for model in (User, Complaint, ComplaintLocation, TrainDetails, Station):
+        for index in model.__table__.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+    if db.engine.dialect.name != "postgresql":
+        return
+    from sqlalchemy import text
+    from sqlalchemy.exc import DBAPIError
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for name, table, column in _PG_TRGM_INDEXES:
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)"
+                ))
+    except DBAPIError as e:
+        print(f"[WARN] Trigram indexes not created (needs pg_trgm / CREATE privilege): {e}")
+
+
+def _ensure_station_table():
+    """STATION_LOOKUP=db on PostgreSQL: earthdistance + GiST index for KNN, station rows seeded from JSON."""
+    if STATION_LOOKUP != "db" or db.engine.dialect.name != "postgresql":
+        return
+    from sqlalchemy import text
+    from services.location_service import _load_stations
+
+    with db.engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS cube"))
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS earthdistance"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_station_earth ON stations USING gist (ll_to_earth(lat, lon))"
+        ))
+    with db.session.begin():
+        if Station.query.first() is None:
+            db.session.add_all(
+                Station(code=s.get("code"), name=s["name"], lat=s["lat"], lon=s["lon"], city=s.get("city"))
+                for s in _load_stations()
+            )
+            print("[INFO] Stations table seeded from STATIONS_JSON_PATH")
+
+
+def _init_db():
+    """Create tables and seed the guest/admin users. Run once per deploy, not per worker."""
+    from sqlalchemy.exc import IntegrityError
+    from services.auth_service import hash_password
 
-with app.app_context():
     db.create_all()
-    # Create guest user for unauthenticated complaint submit (optional)
-    if User.query.filter_by(email="guest@railway.local").first() is None:
-        from services.auth_service import hash_password
-        guest = User(
-            email="guest@railway.local",
-            password_hash=hash_password(os.getenv("GUEST_PASSWORD", "guest")),
-            full_name="Guest User",
-            role="user",
-        )
-        db.session.add(guest)
-        db.session.commit()
-        print("[INFO] Guest user created for anonymous complaint submission")
+    _ensure_indexes()
+    _ensure_station_table()
     admin_email = os.getenv("ADMIN_EMAIL")
-    if admin_email:
-        admin_user = User.query.filter_by(email=admin_email).first()
-        if admin_user and admin_user.role != "admin":
-            admin_user.role = "admin"
-            db.session.commit()
-            print(f"[INFO] User {admin_email} set as admin")
-        elif not admin_user:
-            from services.auth_service import hash_password
-            admin_user = User(
-                email=admin_email,
-                password_hash=hash_password(os.getenv("ADMIN_PASSWORD", "admin")),
-                full_name="Admin",
-                role="admin",
-            )
-            db.session.add(admin_user)
-            db.session.commit()
-            print(f"[INFO] Admin user created: {admin_email}")
+    try:
+        # One transaction: a concurrent run fails on the unique email instead of double-inserting
+        with db.session.begin():
+            # Create guest user for unauthenticated complaint submit (optional)
+            if User.query.filter_by(email=GUEST_EMAIL).first() is None:
+                guest = User(
+                    email=GUEST_EMAIL,
+                    password_hash=hash_password(os.getenv("GUEST_PASSWORD", "guest")),
+                    full_name="Guest User",
+                    role="user",
+                )
+                db.session.add(guest)
+                print("[INFO] Guest user created for anonymous complaint submission")
+            if admin_email:
+                admin_user = User.query.filter_by(email=admin_email).first()
+                if admin_user and admin_user.role != "admin":
+                    admin_user.role = "admin"
+                    print(f"[INFO] User {admin_email} set as admin")
+                elif not admin_user:
+                    admin_user = User(
+                        email=admin_email,
+                        password_hash=hash_password(os.getenv("ADMIN_PASSWORD", "admin")),
+                        full_name="Admin",
+                        role="admin",
+                    )
+                    db.session.add(admin_user)
+                    print(f"[INFO] Admin user created: {admin_email}")
+    except IntegrityError:
+        print("[WARN] Seed users already being created by another process; skipped")
+
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Create database tables and seed guest/admin users."""
+    _init_db()
+    print("[OK] Database initialized")
+
+
+if os.getenv("FLASK_AUTO_INIT_DB") == "1":
+    with app.app_context():
+        _init_db()
 
 @app.after_request
 def after_request(response):
@@ -70,7 +151,33 @@ def after_request(response):
     response.headers.add("Access-Control-Allow-Methods", "GET,PUT,POST,DELETE,PATCH,OPTIONS")
     return response
 
-initialize_gemini()
+_services_ready = False
+_services_lock = threading.Lock()
+
+
+@app.before_request
+def init_services():
+    """Initialize Gemini and warm up the ML model on the first request instead of at import."""
+    global _services_ready
+    if _services_ready:
+        return
+    with _services_lock:
+        if _services_ready:
+            return
+        try:
+            initialize_gemini()
+            if warmup_ml():
+                print("[INFO] ML model loaded and warmed up")
+        finally:
+            _services_ready = True
+
+
+@app.before_request
+def load_claims():
+    """Decode the Bearer token once per request; route helpers read g.claims (AccessClaims or None)."""
+    auth = request.headers.get("Authorization", "")
+    g.claims = decode_access_token(auth[7:]) if auth[:7] == "Bearer " else None
+
 
 app.register_blueprint(auth_bp, url_prefix="/api/auth")
 app.register_blueprint(location_bp, url_prefix="/api/location")
@@ -88,8 +195,18 @@ def health_check():
     })
 
 
+# ML_PRELOAD=1 with gunicorn --preload: load the model before workers fork so they share it.
+# Off by default: the warm-up inference starts TF/ONNX Runtime thread pools (and a CUDA context
+# on GPU) in the master, which the forked workers cannot use (see README).
+# The EasyOCR reader is never built here (torch/CUDA state doesn't survive fork): each worker
+# builds it on its first ticket upload (ocr_service._get_reader).
+if os.getenv("ML_PRELOAD") == "1" and warmup_ml():
+    print("[INFO] ML model preloaded")
+
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 5000))
     print(f"[SERVER] Running on http://localhost:{port}")
     print("[SERVER] Ready: complaint submit, auth, location, ticket OCR, admin")
-    app.run(host="0.0.0.0", port=port, debug=True)
+    # Dev server only; production runs under gunicorn (see run.py)
+    app.run(host="0.0.0.0", port=port, debug=os.getenv("FLASK_DEBUG") == "1", threaded=True)
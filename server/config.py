@@ -18,6 +18,16 @@ DATABASE_URL = os.getenv(
 if DATABASE_URL.startswith("postgresql://") and "?" not in DATABASE_URL:
     DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql://", 1)
 
+# Connection pool (per worker process): keep pool_size + max_overflow times the worker count
+# below the server's max_connections. pre_ping/recycle drop connections the server or a proxy closed.
+SQLALCHEMY_ENGINE_OPTIONS = {"pool_pre_ping": True, "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800"))}
+if not DATABASE_URL.startswith("sqlite"):
+    # QueuePool sizing; SQLite's default pool (per-thread connections) doesn't take these
+    SQLALCHEMY_ENGINE_OPTIONS.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    )
+
 # JWT
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "change-me-in-production-use-env")
 JWT_ALGORITHM = "HS256"
@@ -27,8 +37,8 @@ JWT_REFRESH_EXPIRE_DAYS = int(os.getenv("JWT_REFRESH_EXPIRE_DAYS", "7"))
 # Uploads
 UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", str(PROJECT_ROOT / "uploads"))
 MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # 10MB
-ALLOWED_IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp", "jfif"}
-ALLOWED_TICKET_EXTENSIONS = {"png", "jpg", "jpeg", "pdf"}
+ALLOWED_IMAGE_EXTENSIONS = frozenset({"png", "jpg", "jpeg", "gif", "webp", "jfif"})
+ALLOWED_TICKET_EXTENSIONS = frozenset({"png", "jpg", "jpeg", "pdf"})
 
 # ML model paths (relative to project root)
 ML_MODEL_PATH = os.getenv("ML_MODEL_PATH", str(PROJECT_ROOT / "railway_issue_model.h5"))
@@ -39,6 +49,8 @@ OCR_ENGINE = os.getenv("OCR_ENGINE", "easyocr")  # easyocr | tesseract
 
 # Station data for nearest-station resolution
 STATIONS_JSON_PATH = os.getenv("STATIONS_JSON_PATH", str(BASE_DIR / "data" / "railway_stations.json"))
+# memory: BallTree/NumPy over the JSON file | db: KNN in PostgreSQL (earthdistance + GiST, see init-db)
+STATION_LOOKUP = os.getenv("STATION_LOOKUP", "memory")
 
 # Roles
 ROLE_USER = "user"
@@ -46,6 +58,9 @@ ROLE_DEPARTMENT = "department"
 ROLE_ADMIN = "admin"
 ROLES = [ROLE_USER, ROLE_DEPARTMENT, ROLE_ADMIN]
 
+# Shared account for unauthenticated complaint submit (seeded by init-db)
+GUEST_EMAIL = "guest@railway.local"
+
 # Complaint status
 STATUS_PENDING = "pending"
 STATUS_IN_PROGRESS = "in_progress"
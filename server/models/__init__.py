@@ -3,5 +3,6 @@ SQLAlchemy models for Railway AI Complaint Management System.
 """
 from .user import User
 from .complaint import Complaint, ComplaintLocation, TrainDetails
+from .station import Station
 
-__all__ = ["User", "Complaint", "ComplaintLocation", "TrainDetails"]
+__all__ = ["User", "Complaint", "ComplaintLocation", "TrainDetails", "Station"]
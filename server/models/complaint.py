@@ -7,6 +7,16 @@ from extensions import db
 
 class Complaint(db.Model):
     __tablename__ = "complaints"
+    __table_args__ = (
+        # User history (/complaint/my) and admin filters, both ordered by created_at
+        db.Index("ix_complaint_user_created", "user_id", "created_at"),
+        db.Index("ix_complaint_status_priority_created", "status", "priority", "created_at"),
+        db.Index("ix_complaint_dept_status", "assigned_department", "status"),
+        # Admin list: unfiltered, ?status= and ?issue_type= pages sorted by (created_at, id) desc
+        db.Index("ix_complaint_created_id", "created_at", "id"),
+        db.Index("ix_complaint_status_created", "status", "created_at"),
+        db.Index("ix_complaint_category_created", "issue_category", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     complaint_id = db.Column(db.String(50), unique=True, nullable=False, index=True)  # RM-YYYYMMDD-XXXXXX
@@ -56,6 +66,10 @@ class Complaint(db.Model):
 
 class ComplaintLocation(db.Model):
     __tablename__ = "complaint_locations"
+    __table_args__ = (
+        # Map / bounding-box lookups by coordinates
+        db.Index("ix_location_lat_lon", "latitude", "longitude"),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     complaint_id = db.Column(db.Integer, db.ForeignKey("complaints.id"), nullable=False, index=True)
@@ -65,7 +79,9 @@ class ComplaintLocation(db.Model):
     nearest_station = db.Column(db.String(255), nullable=True)
     station_proximity_km = db.Column(db.Float, nullable=True)
     railway_context = db.Column(db.Text, nullable=True)  # JSON or text description
-    captured_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Server default (UTC on SQLite; the session time zone on PostgreSQL) so bulk / raw SQL
+    # inserts can omit the column; create_complaint passes its own timestamp.
+    captured_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=db.func.current_timestamp())
 
     complaint = db.relationship("Complaint", back_populates="location")
 
@@ -0,0 +1,19 @@
+"""
+Railway station reference data, seeded from STATIONS_JSON_PATH by init-db.
+Only read by the PostgreSQL earthdistance lookup (STATION_LOOKUP=db).
+"""
+from extensions import db
+
+
+class Station(db.Model):
+    __tablename__ = "stations"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    code = db.Column(db.String(50), nullable=True)
+    name = db.Column(db.String(255), nullable=False)
+    lat = db.Column(db.Float, nullable=False)
+    lon = db.Column(db.Float, nullable=False)
+    city = db.Column(db.String(255), nullable=True)
+
+    def __repr__(self):
+        return f"<Station {self.code} {self.name}>"
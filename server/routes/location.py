@@ -2,8 +2,10 @@
 Location API: receive GPS, return railway context (nearest station, proximity).
 Does not require auth for submission; complaint submission will attach location.
 """
+from datetime import datetime
+
 from flask import Blueprint, request, jsonify
-from services.location_service import get_nearest_station, build_location_record
+from services.location_service import build_location_record
 
 location_bp = Blueprint("location", __name__)
 
@@ -26,7 +28,6 @@ def resolve_location():
             accuracy_m = float(accuracy_m)
         except (TypeError, ValueError):
             accuracy_m = None
-    ctx = get_nearest_station(lat, lon)
     record = build_location_record(lat, lon, accuracy_m)
     return jsonify({
         "success": True,
@@ -37,6 +38,6 @@ def resolve_location():
             "nearestStation": record["nearest_station"],
             "stationProximityKm": record["station_proximity_km"],
             "railwayContext": record["railway_context"],
-            "capturedAt": record["captured_at"].isoformat() if record.get("captured_at") else None,
+            "capturedAt": (record["captured_at"] or datetime.utcnow()).isoformat(),
         },
     })
@@ -1,30 +1,41 @@
 """
 ML inference API: EfficientNet image classification with confidence score.
 """
-import os
-from flask import Blueprint, request, jsonify
-from services.ml_inference_service import predict_issue_from_image, map_effnet_to_department, map_effnet_to_priority
-from config import ALLOWED_IMAGE_EXTENSIONS
+from flask import Blueprint, g, request, jsonify
+from services.ml_inference_service import (
+    predict_issue_from_image,
+    predict_issues_from_images,
+    map_effnet_to_department,
+    map_effnet_to_priority,
+)
+from config import ALLOWED_IMAGE_EXTENSIONS, ROLE_ADMIN, ROLE_DEPARTMENT
+from utils import allowed_extension
 
 ml_bp = Blueprint("ml", __name__)
 
+MAX_BATCH_FILES = 64
+_BATCH_ROLES = frozenset((ROLE_ADMIN, ROLE_DEPARTMENT))
 
-def _allowed(filename):
-    ext = (filename or "").rsplit(".", 1)[-1].lower()
-    return ext in ALLOWED_IMAGE_EXTENSIONS
+
+def _probs_to_dict(class_names, probs):
+    """class -> probability; only built when the client asks for the full distribution (?full=1)."""
+    if probs is None:
+        return {}
+    return dict(zip(class_names, probs.tolist()))
 
 
 @ml_bp.route("/predict", methods=["POST"])
 def predict():
     """
-    Upload image; returns issue_category, confidence, all_probs, suggested department/priority.
+    Upload image; returns issue_category, confidence, suggested department/priority.
+    Add ?full=1 to also get all_probs (class -> probability).
     """
     if "image" not in request.files and "file" not in request.files:
         return jsonify({"error": "Image file (image or file) is required"}), 400
     file = request.files.get("image") or request.files.get("file")
     if not file or file.filename == "":
         return jsonify({"error": "No file selected"}), 400
-    if not _allowed(file.filename):
+    if not allowed_extension(file.filename, ALLOWED_IMAGE_EXTENSIONS):
         return jsonify({"error": "Allowed: png, jpg, jpeg, gif, webp, jfif"}), 400
     data = file.read()
     result = predict_issue_from_image(data)
@@ -37,11 +48,52 @@ def predict():
             "all_probs": {},
         })
     category = result.get("issue_category")
-    return jsonify({
+    body = {
         "success": True,
         "issue_category": category,
         "confidence": result.get("confidence", 0),
-        "all_probs": result.get("all_probs", {}),
         "suggested_department": map_effnet_to_department(category) if category else None,
         "suggested_priority": map_effnet_to_priority(category) if category else None,
-    })
+    }
+    if request.args.get("full") == "1":
+        body["all_probs"] = _probs_to_dict(result["class_names"], result["probs"])
+    return jsonify(body)
+
+
+@ml_bp.route("/predict_batch", methods=["POST"])
+def predict_batch():
+    """
+    Classify images in bulk (admin / department only).
+    Body: multipart/form-data with one or more "images" files. Add ?full=1 to include all_probs per file.
+    """
+    claims = g.get("claims")
+    if claims is None or claims.role not in _BATCH_ROLES:
+        return jsonify({"error": "Admin or department access required"}), 403
+    files = request.files.getlist("images")
+    if not files:
+        return jsonify({"error": "One or more image files (images) are required"}), 400
+    if len(files) > MAX_BATCH_FILES:
+        return jsonify({"error": f"At most {MAX_BATCH_FILES} files per batch"}), 400
+
+    results = [None] * len(files)
+    streams, positions = [], []
+    for i, file in enumerate(files):
+        if not file.filename or not allowed_extension(file.filename, ALLOWED_IMAGE_EXTENSIONS):
+            results[i] = {"filename": file.filename, "error": "Not an allowed image"}
+            continue
+        streams.append(file.stream)
+        positions.append(i)
+
+    full = request.args.get("full") == "1"
+    for i, result in zip(positions, predict_issues_from_images(streams)):
+        category = result.get("issue_category")
+        results[i] = {
+            "filename": files[i].filename,
+            "issue_category": category,
+            "confidence": result.get("confidence", 0),
+            "suggested_department": map_effnet_to_department(category) if category else None,
+            "suggested_priority": map_effnet_to_priority(category) if category else None,
+        }
+        if full:
+            results[i]["all_probs"] = _probs_to_dict(result["class_names"], result["probs"])
+    return jsonify({"success": True, "results": results, "count": len(results)})
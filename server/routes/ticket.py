@@ -5,6 +5,7 @@ import os
 from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
 from config import ALLOWED_TICKET_EXTENSIONS, UPLOAD_FOLDER
+from utils import allowed_extension
 from services.ocr_service import extract_train_details_from_ticket
 
 ticket_bp = Blueprint("ticket", __name__)
@@ -12,11 +13,6 @@ ticket_bp = Blueprint("ticket", __name__)
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 
-def allowed_ticket(filename):
-    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
-    return ext in ALLOWED_TICKET_EXTENSIONS
-
-
 @ticket_bp.route("/extract", methods=["POST"])
 def extract_ticket():
     """
@@ -28,7 +24,7 @@ def extract_ticket():
     file = request.files.get("ticket") or request.files.get("file")
     if not file or file.filename == "":
         return jsonify({"error": "No file selected"}), 400
-    if not allowed_ticket(file.filename):
+    if not allowed_extension(file.filename, ALLOWED_TICKET_EXTENSIONS):
         return jsonify({
             "error": f"Allowed formats: {', '.join(ALLOWED_TICKET_EXTENSIONS)}"
         }), 400
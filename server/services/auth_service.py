@@ -2,23 +2,60 @@
 Authentication service: password hashing and JWT creation/verification.
 """
 import os
-from datetime import datetime, timedelta
+import time
+import hashlib
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 
+import bcrypt
 import jwt
-from passlib.context import CryptContext
+from cachetools import TLRUCache
 
 from config import JWT_SECRET_KEY, JWT_ALGORITHM, JWT_ACCESS_EXPIRE_MINUTES, ROLE_USER
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@dataclass(frozen=True)
+class AccessClaims:
+    """Claims of a verified access token, extracted once per request."""
+    __slots__ = ("sub", "email", "role", "type")
+    sub: int
+    email: Optional[str]
+    role: Optional[str]
+    type: str
+
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt only uses the first 72 bytes of a password (passlib truncated silently too)
+BCRYPT_MAX_BYTES = 72
+
+# Verified token payloads, keyed by sha256(token)[:16]. Entries live TOKEN_CACHE_TTL seconds,
+# or until the token expires if that is sooner. Failures are never cached.
+TOKEN_CACHE_TTL = 5
+
+# Claims PyJWT must find in every token; missing ones raise MissingRequiredClaimError.
+_DECODE_OPTIONS = {"require": ["exp", "sub", "type"], "verify_exp": True}
+
+
+def _token_ttu(_key, payload, now):
+    return now + min(TOKEN_CACHE_TTL, payload["exp"] - time.time())
+
+
+_TOKEN_CACHE = TLRUCache(maxsize=10000, ttu=_token_ttu)
+_TOKEN_CACHE_LOCK = threading.Lock()
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    secret = password.encode()[:BCRYPT_MAX_BYTES]
+    return bcrypt.hashpw(secret, bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
 
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    try:
+        return bcrypt.checkpw(plain.encode()[:BCRYPT_MAX_BYTES], hashed.encode())
+    except ValueError:  # malformed / non-bcrypt hash
+        return False
 
 
 def create_access_token(
@@ -27,22 +64,44 @@ def create_access_token(
     role: str,
     expires_delta: Optional[timedelta] = None,
 ) -> str:
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=JWT_ACCESS_EXPIRE_MINUTES))
+    now = datetime.now(timezone.utc)
+    expire = now + (expires_delta or timedelta(minutes=JWT_ACCESS_EXPIRE_MINUTES))
     payload = {
-        "sub": str(user_id),
+        "sub": str(user_id),  # RFC 7519 StringOrURI; PyJWT >= 2.10 rejects non-string sub
+        "uid": int(user_id),  # same id as a JSON integer, read without parsing
         "email": email,
         "role": role,
         "exp": expire,
-        "iat": datetime.utcnow(),
+        "iat": now,
         "type": "access",
     }
     return jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
 
 
 def decode_token(token: str) -> Optional[Dict[str, Any]]:
+    key = hashlib.sha256(token.encode()).digest()[:16]
+    with _TOKEN_CACHE_LOCK:
+        payload = _TOKEN_CACHE.get(key)
+    if payload is not None:
+        return payload
     try:
-        return jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-    except jwt.ExpiredSignatureError:
+        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM], options=_DECODE_OPTIONS)
+    except jwt.InvalidTokenError:  # also covers expired tokens and missing claims
         return None
-    except jwt.InvalidTokenError:
+    with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE[key] = payload
+    return payload
+
+
+def decode_access_token(token: str) -> Optional[AccessClaims]:
+    """Verify an access token and return its claims (sub as int), or None if invalid."""
+    payload = decode_token(token)
+    if payload is None or payload["type"] != "access":
         return None
+    sub = payload.get("uid")
+    if sub is None:  # token issued before the uid claim existed
+        try:
+            sub = int(payload["sub"])
+        except (TypeError, ValueError):
+            return None
+    return AccessClaims(sub=sub, email=payload.get("email"), role=payload.get("role"), type=payload["type"])
@@ -3,28 +3,44 @@ Complaint service: create and query complaints with location, train details, and
 Uses database (SQLAlchemy); supports both EfficientNet and Gemini analysis.
 """
 import os
-import random
-import string
-from datetime import datetime
-from typing import Optional, Dict, Any, List
+import secrets
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple
+
+from sqlalchemy import case, cast, func, insert, literal, literal_column, select, tuple_, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import contains_eager, joinedload
 
 from extensions import db
-from models import Complaint, ComplaintLocation, TrainDetails
+from models import User, Complaint, ComplaintLocation, TrainDetails
 from config import STATUS_PENDING
 
+# Relations serialized by Complaint.to_dict(include_location=True, include_train=True); all
+# to-one, so a LEFT OUTER JOIN in the main query avoids one lazy SELECT per relation per row.
+_DETAIL_LOADS = (joinedload(Complaint.location), joinedload(Complaint.train_details))
+_FULL_LOADS = _DETAIL_LOADS + (joinedload(Complaint.user),)
+
+
+_DATE_CACHE = [0.0, ""]  # [timestamp of the next local midnight, "YYYYMMDD" for today]
+
+
+def _today_str() -> str:
+    """Local date as YYYYMMDD; formatted once per day instead of on every insert."""
+    if time.time() >= _DATE_CACHE[0]:
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        _DATE_CACHE[:] = [midnight.timestamp(), now.strftime("%Y%m%d")]
+    return _DATE_CACHE[1]
+
 
 def generate_complaint_id() -> str:
-    """Format: RM-YYYYMMDD-XXXXXX"""
-    date_str = datetime.now().strftime("%Y%m%d")
-    random_str = "".join(random.choices(string.ascii_uppercase + string.digits, k=6))
-    return f"RM-{date_str}-{random_str}"
+    """Format: RM-YYYYMMDD-XXXXXX (6 uppercase hex chars)"""
+    return f"RM-{_today_str()}-{secrets.token_hex(3).upper()}"
 
 
-def _ensure_unique_id() -> str:
-    cid = generate_complaint_id()
-    while Complaint.query.filter_by(complaint_id=cid).first():
-        cid = generate_complaint_id()
-    return cid
+# complaint_id is UNIQUE: instead of a SELECT before every insert, retry on the rare collision
+_ID_ATTEMPTS = 3
 
 
 def create_complaint(
@@ -36,68 +52,83 @@ def create_complaint(
     description_override: Optional[str] = None,
 ) -> Complaint:
     """
-    Create complaint with optional location and train details.
+    Create complaint with optional location and train details (Core INSERTs, one commit).
+    Returns a transient Complaint for serialization.
     analysis_result must have: issue_category, issue_details, priority, department, complaint_description
     (and optionally ai_confidence).
     """
-    complaint_id = _ensure_unique_id()
     desc = description_override or analysis_result.get("complaint_description") or ""
-    priority = analysis_result.get("priority")
-    issue_category = analysis_result.get("issue_category")
-    issue_details = analysis_result.get("issue_details")
-    department = analysis_result.get("department")
-    ai_confidence = analysis_result.get("ai_confidence")
-
-    complaint = Complaint(
-        complaint_id=complaint_id,
-        user_id=user_id,
-        description=desc,
-        status=STATUS_PENDING,
-        priority=priority,
-        issue_category=issue_category,
-        issue_details=issue_details,
-        department=department,
-        ai_confidence=ai_confidence,
-        image_filename=image_filename,
-    )
-    db.session.add(complaint)
-    db.session.flush()  # get complaint.id
+    now = datetime.utcnow()
+    values = {
+        "user_id": user_id,
+        "description": desc,
+        "status": STATUS_PENDING,
+        "priority": analysis_result.get("priority"),
+        "issue_category": analysis_result.get("issue_category"),
+        "issue_details": analysis_result.get("issue_details"),
+        "department": analysis_result.get("department"),
+        "ai_confidence": analysis_result.get("ai_confidence"),
+        "image_filename": image_filename,
+        "created_at": now,
+        "updated_at": now,
+    }
+    # One INSERT ... RETURNING id instead of add + flush + commit + refresh
+    for attempt in range(_ID_ATTEMPTS):
+        values["complaint_id"] = generate_complaint_id()
+        try:
+            pk = db.session.execute(insert(Complaint).returning(Complaint.id), values).scalar_one()
+            break
+        except IntegrityError:
+            db.session.rollback()
+            if attempt == _ID_ATTEMPTS - 1:
+                raise
 
+    loc_values = None
     if location_data:
-        loc = ComplaintLocation(
-            complaint_id=complaint.id,
-            latitude=location_data["latitude"],
-            longitude=location_data["longitude"],
-            accuracy_m=location_data.get("accuracy_m"),
-            nearest_station=location_data.get("nearest_station"),
-            station_proximity_km=location_data.get("station_proximity_km"),
-            railway_context=location_data.get("railway_context"),
-            captured_at=location_data.get("captured_at") or datetime.utcnow(),
-        )
-        db.session.add(loc)
+        loc_values = {
+            "complaint_id": pk,
+            "latitude": location_data["latitude"],
+            "longitude": location_data["longitude"],
+            "accuracy_m": location_data.get("accuracy_m"),
+            "nearest_station": location_data.get("nearest_station"),
+            "station_proximity_km": location_data.get("station_proximity_km"),
+            "railway_context": location_data.get("railway_context"),
+            "captured_at": location_data.get("captured_at") or now,
+        }
+        db.session.execute(insert(ComplaintLocation), [loc_values])
 
+    td_values = None
     if train_details_data:
-        td = TrainDetails(
-            complaint_id=complaint.id,
-            train_number=train_details_data.get("train_number") or train_details_data.get("trainNumber"),
-            train_name=train_details_data.get("train_name") or train_details_data.get("trainName"),
-            coach_number=train_details_data.get("coach_number") or train_details_data.get("coachNumber"),
-            seat_number=train_details_data.get("seat_number") or train_details_data.get("seatNumber"),
-            boarding_station=train_details_data.get("boarding_station") or train_details_data.get("boardingStation"),
-            destination_station=train_details_data.get("destination_station") or train_details_data.get("destinationStation"),
-            source=train_details_data.get("source", "manual"),
-            raw_ocr_text=train_details_data.get("raw_ocr_text") or train_details_data.get("rawOcrText"),
-        )
-        db.session.add(td)
+        td = train_details_data
+        td_values = {
+            "complaint_id": pk,
+            "train_number": td.get("train_number") or td.get("trainNumber"),
+            "train_name": td.get("train_name") or td.get("trainName"),
+            "coach_number": td.get("coach_number") or td.get("coachNumber"),
+            "seat_number": td.get("seat_number") or td.get("seatNumber"),
+            "boarding_station": td.get("boarding_station") or td.get("boardingStation"),
+            "destination_station": td.get("destination_station") or td.get("destinationStation"),
+            "source": td.get("source", "manual"),
+            "raw_ocr_text": td.get("raw_ocr_text") or td.get("rawOcrText"),
+            "created_at": now,
+        }
+        db.session.execute(insert(TrainDetails), [td_values])
 
     db.session.commit()
-    db.session.refresh(complaint)
+
+    # Every column value is known here, so build the result without a refresh SELECT. The
+    # objects are transient (not in the session); callers only serialize them with to_dict().
+    complaint = Complaint(id=pk, **values)
+    if loc_values:
+        complaint.location = ComplaintLocation(**loc_values)
+    if td_values:
+        complaint.train_details = TrainDetails(**td_values)
     return complaint
 
 
 def get_complaint_by_id(complaint_id: str) -> Optional[Complaint]:
     """Get complaint by RM-... id."""
-    return Complaint.query.filter_by(complaint_id=complaint_id).first()
+    return Complaint.query.options(*_FULL_LOADS).filter_by(complaint_id=complaint_id).first()
 
 
 def get_complaint_by_db_id(complaint_db_id: int) -> Optional[Complaint]:
@@ -105,7 +136,12 @@ def get_complaint_by_db_id(complaint_db_id: int) -> Optional[Complaint]:
 
 
 def get_complaints_by_user(user_id: int) -> List[Complaint]:
-    return Complaint.query.filter_by(user_id=user_id).order_by(Complaint.created_at.desc()).all()
+    return (
+        Complaint.query.options(*_DETAIL_LOADS)
+        .filter_by(user_id=user_id)
+        .order_by(Complaint.created_at.desc())
+        .all()
+    )
 
 
 def get_all_complaints(
@@ -115,9 +151,32 @@ def get_all_complaints(
     status: Optional[str] = None,
     limit: int = 100,
     offset: int = 0,
+    after: Optional[Tuple[datetime, int]] = None,
 ) -> List[Complaint]:
-    """Admin: list complaints with optional filters."""
-    q = Complaint.query
+    """Admin: list complaints with optional filters. Pass the last row's (created_at, id) as after for the next page."""
+    # Filters on station / train already INNER JOIN those tables: populate the relation from
+    # that join (contains_eager) instead of adding a second, aliased eager join.
+    loads = (
+        joinedload(Complaint.user),
+        contains_eager(Complaint.location) if station else joinedload(Complaint.location),
+        contains_eager(Complaint.train_details) if train_number else joinedload(Complaint.train_details),
+    )
+    q = _filter_complaints(Complaint.query, station, train_number, issue_type, status).options(*loads)
+    return _paginate(q, limit, offset, after).all()
+
+
+def _paginate(q, limit, offset, after):
+    """
+    Newest first. With a cursor (keyset pagination) the page starts right after the previous
+    page's last (created_at, id) via the index instead of scanning and discarding offset rows.
+    """
+    q = q.order_by(Complaint.created_at.desc(), Complaint.id.desc())
+    if after is not None:
+        return q.filter(tuple_(Complaint.created_at, Complaint.id) < tuple_(*after)).limit(limit)
+    return q.limit(limit).offset(offset)
+
+
+def _filter_complaints(q, station, train_number, issue_type, status):
     if status:
         q = q.filter(Complaint.status == status)
     if issue_type:
@@ -136,30 +195,151 @@ def get_all_complaints(
                 TrainDetails.train_number.ilike(f"%{train_number}%"),
             )
         )
-    return q.order_by(Complaint.created_at.desc()).limit(limit).offset(offset).all()
+    return q
+
+
+# --- Database-side serialization (PostgreSQL / SQLite JSON1) ---------------------------------
+
+def _json_object(dialect, fields):
+    build = func.json_build_object if dialect == "postgresql" else func.json_object
+    args = []
+    for key, value in fields:
+        args += [literal_column(f"'{key}'"), value]
+    return build(*args)
+
+
+def _json_ts(dialect, col):
+    """Same text as datetime.isoformat() for the naive UTC timestamps stored by the models."""
+    if dialect == "postgresql":
+        return func.to_char(col, 'YYYY-MM-DD"T"HH24:MI:SS.US')
+    return func.replace(col, " ", "T")
+
+
+def _json_bool(dialect, col):
+    if dialect == "postgresql":
+        return col
+    return case((col, func.json("true")), else_=func.json("false"))
+
+
+def _json_nested(dialect, pk, obj):
+    """Nested object, or JSON null when the outer-joined row is missing."""
+    nested = case((pk.is_(None), None), else_=obj)
+    return nested if dialect == "postgresql" else func.json(nested)
+
+
+def get_all_complaints_json(
+    station: Optional[str] = None,
+    train_number: Optional[str] = None,
+    issue_type: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0,
+    after: Optional[Tuple[datetime, int]] = None,
+) -> Optional[Tuple[List[str], Optional[Tuple[datetime, int]]]]:
+    """
+    Admin list with the JSON built by the database: one encoded object per complaint, same
+    keys as Complaint.to_dict(include_user=True, include_location=True, include_train=True)
+    (missing relations are null instead of absent), plus the last row's (created_at, id) as
+    the cursor for the next page. Returns None on dialects without json_build_object /
+    json_object, so callers fall back to get_all_complaints.
+    """
+    dialect = db.engine.dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        return None
+    page = _paginate(
+        _filter_complaints(db.session.query(Complaint.id, Complaint.created_at), station, train_number, issue_type, status),
+        limit, offset, after,
+    ).subquery()
+    user = _json_object(dialect, [
+        ("id", User.id),
+        ("full_name", User.full_name),
+        ("role", User.role),
+        ("is_active", _json_bool(dialect, User.is_active)),
+        ("created_at", _json_ts(dialect, User.created_at)),
+        ("email", User.email),
+    ])
+    location = _json_object(dialect, [
+        ("latitude", ComplaintLocation.latitude),
+        ("longitude", ComplaintLocation.longitude),
+        ("accuracyM", ComplaintLocation.accuracy_m),
+        ("nearestStation", ComplaintLocation.nearest_station),
+        ("stationProximityKm", ComplaintLocation.station_proximity_km),
+        ("railwayContext", ComplaintLocation.railway_context),
+        ("capturedAt", _json_ts(dialect, ComplaintLocation.captured_at)),
+    ])
+    train = _json_object(dialect, [
+        ("trainNumber", TrainDetails.train_number),
+        ("trainName", TrainDetails.train_name),
+        ("coachNumber", TrainDetails.coach_number),
+        ("seatNumber", TrainDetails.seat_number),
+        ("boardingStation", TrainDetails.boarding_station),
+        ("destinationStation", TrainDetails.destination_station),
+        ("source", TrainDetails.source),
+        ("createdAt", _json_ts(dialect, TrainDetails.created_at)),
+    ])
+    doc = _json_object(dialect, [
+        ("id", Complaint.id),
+        ("complaintId", Complaint.complaint_id),
+        ("userId", Complaint.user_id),
+        ("description", Complaint.description),
+        ("status", Complaint.status),
+        ("priority", Complaint.priority),
+        ("issueCategory", Complaint.issue_category),
+        ("issueDetails", Complaint.issue_details),
+        ("department", Complaint.department),
+        ("assignedDepartment", Complaint.assigned_department),
+        ("aiConfidence", Complaint.ai_confidence),
+        ("imageFilename", Complaint.image_filename),
+        ("createdAt", _json_ts(dialect, Complaint.created_at)),
+        ("updatedAt", _json_ts(dialect, Complaint.updated_at)),
+        ("user", _json_nested(dialect, User.id, user)),
+        ("location", _json_nested(dialect, ComplaintLocation.id, location)),
+        ("trainDetails", _json_nested(dialect, TrainDetails.id, train)),
+    ])
+    if dialect == "postgresql":
+        doc = cast(doc, db.Text)  # keep the driver from decoding json back into dicts
+    rows = (
+        db.session.query(doc, page.c.created_at, page.c.id)
+        .select_from(page)
+        .join(Complaint, Complaint.id == page.c.id)
+        .outerjoin(User, User.id == Complaint.user_id)
+        .outerjoin(ComplaintLocation, ComplaintLocation.complaint_id == Complaint.id)
+        .outerjoin(TrainDetails, TrainDetails.complaint_id == Complaint.id)
+        .order_by(page.c.created_at.desc(), page.c.id.desc())
+        .all()
+    )
+    return [r[0] for r in rows], (tuple(rows[-1][1:]) if rows else None)
 
 
 def get_complaints_for_map(limit: int = 500) -> List[Dict[str, Any]]:
-    """Complaints with location for map view."""
-    q = (
-        Complaint.query.join(ComplaintLocation, Complaint.id == ComplaintLocation.complaint_id)
-        .with_entities(Complaint, ComplaintLocation)
+    """Complaints with location for map view. Selects only the columns the map needs (no ORM objects)."""
+    rows = (
+        db.session.query(
+            Complaint.complaint_id,
+            ComplaintLocation.latitude,
+            ComplaintLocation.longitude,
+            Complaint.status,
+            Complaint.priority,
+            Complaint.issue_category,
+            ComplaintLocation.nearest_station,
+        )
+        .join(ComplaintLocation, Complaint.id == ComplaintLocation.complaint_id)
         .order_by(Complaint.created_at.desc())
         .limit(limit)
+        .all()
     )
-    rows = q.all()
-    out = []
-    for complaint, loc in rows:
-        out.append({
-            "complaintId": complaint.complaint_id,
-            "latitude": loc.latitude,
-            "longitude": loc.longitude,
-            "status": complaint.status,
-            "priority": complaint.priority,
-            "issueCategory": complaint.issue_category,
-            "nearestStation": loc.nearest_station,
-        })
-    return out
+    return [
+        {
+            "complaintId": cid,
+            "latitude": lat,
+            "longitude": lon,
+            "status": status,
+            "priority": priority,
+            "issueCategory": category,
+            "nearestStation": station,
+        }
+        for cid, lat, lon, status, priority, category, station in rows
+    ]
 
 
 def update_complaint_status(complaint_id: str, status: str) -> Optional[Complaint]:
@@ -187,26 +367,19 @@ def assign_department(complaint_id: str, department: str) -> Optional[Complaint]
 
 def get_insights() -> Dict[str, Any]:
     """AI insights: counts by category, status, priority; optional heatmap data."""
-    from sqlalchemy import func
-    by_category = (
-        db.session.query(Complaint.issue_category, func.count(Complaint.id))
-        .filter(Complaint.issue_category.isnot(None))
-        .group_by(Complaint.issue_category)
-        .all()
-    )
-    by_status = (
-        db.session.query(Complaint.status, func.count(Complaint.id))
-        .group_by(Complaint.status)
-        .all()
+    # One round trip: the three GROUP BYs tagged with their dimension and UNION ALL'ed
+    dims = (
+        ("byCategory", Complaint.issue_category, Complaint.issue_category.isnot(None)),
+        ("byStatus", Complaint.status, None),
+        ("byPriority", Complaint.priority, Complaint.priority.isnot(None)),
     )
-    by_priority = (
-        db.session.query(Complaint.priority, func.count(Complaint.id))
-        .filter(Complaint.priority.isnot(None))
-        .group_by(Complaint.priority)
-        .all()
-    )
-    return {
-        "byCategory": {k: v for k, v in by_category},
-        "byStatus": {k: v for k, v in by_status},
-        "byPriority": {k: v for k, v in by_priority},
-    }
+    selects = []
+    for name, col, where in dims:
+        q = select(literal(name).label("dim"), col.label("k"), func.count(Complaint.id).label("n"))
+        if where is not None:
+            q = q.where(where)
+        selects.append(q.group_by(col))
+    insights: Dict[str, Any] = {name: {} for name, _, _ in dims}
+    for dim, k, n in db.session.execute(union_all(*selects)):
+        insights[dim][k] = n
+    return insights
@@ -1,12 +1,19 @@
 import os
+import io
 import json
-import re
+import logging
+from PIL import Image
 from google import generativeai as genai
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 # Global model variable
 model = None
 
+# Image types Gemini accepts as inline data; anything else (GIF, BMP, ...) is re-encoded to PNG
+GEMINI_IMAGE_TYPES = frozenset(('image/png', 'image/jpeg', 'image/webp', 'image/heic', 'image/heif'))
+
 def initialize_gemini():
     """Initialize Gemini AI client"""
     global model
@@ -41,7 +48,7 @@ def analyze_image(image_data, mime_type, additional_text=''):
     Analyze image using Gemini Vision API
     
     Args:
-        image_data: Image file bytes
+        image_data: Image file bytes or binary file object
         mime_type: Image MIME type
         additional_text: Optional additional text from user
     
@@ -55,15 +62,12 @@ def analyze_image(image_data, mime_type, additional_text=''):
     prompt = build_analysis_prompt(additional_text)
     
     try:
-        # Prepare image part
-        import PIL.Image
-        import io
-        
-        # Convert bytes to PIL Image
-        image = PIL.Image.open(io.BytesIO(image_data))
+        # Send the encoded file as an inline blob: no PIL decode + re-encode by the SDK
+        data = image_data.read() if hasattr(image_data, "read") else image_data
+        image_part = _inline_image(data, mime_type or 'image/jpeg')
         
         # Generate content
-        response = model.generate_content([prompt, image])
+        response = model.generate_content([prompt, image_part])
         text = response.text
         
         # Parse JSON response
@@ -71,9 +75,25 @@ def analyze_image(image_data, mime_type, additional_text=''):
         
         return analysis_result
     except Exception as error:
-        print(f'Error analyzing image with Gemini: {error}')
+        logger.warning('Error analyzing image with Gemini: %s', error)
         raise Exception(f'AI analysis failed: {str(error)}')
 
+def _inline_image(data, mime_type):
+    """Inline blob for generate_content, in a format Gemini accepts."""
+    if mime_type == 'image/mpo':
+        # Multi-picture JPEG (what Pillow reports for most phone-camera JPEGs): the file
+        # starts with a complete baseline JPEG, which is what Gemini decodes
+        return {'mime_type': 'image/jpeg', 'data': data}
+    if mime_type in GEMINI_IMAGE_TYPES:
+        return {'mime_type': mime_type, 'data': data}
+    with Image.open(io.BytesIO(data)) as img:  # first frame for animated GIFs
+        if img.mode not in ('1', 'L', 'LA', 'P', 'RGB', 'RGBA'):
+            img = img.convert('RGB')
+        buf = io.BytesIO()
+        img.save(buf, format='PNG')
+    return {'mime_type': 'image/png', 'data': buf.getvalue()}
+
+
 def build_analysis_prompt(additional_text):
     """Build structured prompt for Gemini Vision API"""
     prompt = """You are an expert railway complaint analyst. Analyze the uploaded image and classify the railway issue.
@@ -130,6 +150,33 @@ Return ONLY the JSON object, nothing else."""
     
     return prompt
 
+# Fields every Gemini analysis must contain, and the accepted priority values
+REQUIRED_FIELDS = (
+    'issue_category',
+    'issue_details',
+    'priority',
+    'department',
+    'complaint_description',
+)
+VALID_PRIORITIES = frozenset(('CRITICAL', 'HIGH', 'MEDIUM', 'LOW'))
+
+_json_decoder = json.JSONDecoder()
+
+
+def _first_json_object(text):
+    """Decode the first complete JSON object in text (ignores ``` fences / surrounding prose)."""
+    start = text.find('{')
+    while start != -1:
+        try:
+            obj, _ = _json_decoder.raw_decode(text, start)
+            if isinstance(obj, dict):
+                return obj
+        except ValueError:
+            pass
+        start = text.find('{', start + 1)
+    raise Exception('No JSON object found in response')
+
+
 def parse_analysis_response(text):
     """
     Parse and validate Gemini response
@@ -141,39 +188,19 @@ def parse_analysis_response(text):
         dict: Parsed and validated analysis result
     """
     try:
-        # Remove markdown code blocks if present
-        json_text = text.strip()
-        json_text = re.sub(r'```json\n?', '', json_text)
-        json_text = re.sub(r'```\n?', '', json_text)
-        json_text = json_text.strip()
-        
-        # Find JSON object in response
-        json_match = re.search(r'\{[\s\S]*\}', json_text)
-        if not json_match:
-            raise Exception('No JSON object found in response')
-        
-        parsed = json.loads(json_match.group(0))
+        parsed = _first_json_object(text)
         
         # Validate required fields
-        required_fields = [
-            'issue_category',
-            'issue_details',
-            'priority',
-            'department',
-            'complaint_description'
-        ]
-        
-        for field in required_fields:
+        for field in REQUIRED_FIELDS:
             if field not in parsed:
                 raise Exception(f'Missing required field: {field}')
         
         # Validate priority
-        valid_priorities = ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW']
-        if parsed['priority'] not in valid_priorities:
+        if parsed['priority'] not in VALID_PRIORITIES:
             raise Exception(f'Invalid priority: {parsed["priority"]}')
         
         return parsed
     except Exception as error:
-        print(f'Failed to parse Gemini response: {error}')
-        print(f'Raw response: {text}')
+        logger.warning('Failed to parse Gemini response: %s', error)
+        logger.debug('Raw response: %s', text)
         raise Exception(f'Failed to parse AI response: {str(error)}')
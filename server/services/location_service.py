@@ -5,12 +5,23 @@ Uses Haversine distance and a static station list; production can use an externa
 import os
 import json
 import math
+import functools
+import logging
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+
+from config import STATION_LOOKUP
+
+EARTH_RADIUS_KM = 6371
+
+logger = logging.getLogger(__name__)
+
 
 # Haversine formula (km)
 def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    R = 6371  # Earth radius in km
+    R = EARTH_RADIUS_KM
     phi1 = math.radians(lat1)
     phi2 = math.radians(lat2)
     dphi = math.radians(lat2 - lat1)
@@ -20,15 +31,83 @@ def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return R * c
 
 
-def _load_stations(path: Optional[str] = None) -> list:
+def _haversine_rad(phi1, lam1, lat_rad, lon_rad, cos_lat):
+    """Haversine km on radians (broadcasts); cos_lat = cos(lat_rad), precomputed by callers that reuse it."""
+    a = np.sin((lat_rad - phi1) / 2) ** 2 + np.cos(phi1) * cos_lat * np.sin((lon_rad - lam1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def haversine_km_vec(lat1: float, lon1: float, lats, lons) -> np.ndarray:
+    """Distances (km) from one point to arrays of points, all in degrees. Use haversine_km for a single pair."""
+    lat_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    lon_rad = np.radians(np.asarray(lons, dtype=np.float64))
+    return _haversine_rad(math.radians(lat1), math.radians(lon1), lat_rad, lon_rad, np.cos(lat_rad))
+
+
+def _stations_path(path: Optional[str] = None) -> str:
     path = path or os.getenv("STATIONS_JSON_PATH")
     if not path:
         base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         path = os.path.join(base, "data", "railway_stations.json")
+    return path
+
+
+@functools.lru_cache(maxsize=4)
+def _load_stations_cached(path: str) -> tuple:
     if not os.path.exists(path):
-        return []
+        return ()
     with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+        return tuple(json.load(f))
+
+
+def _load_stations(path: Optional[str] = None) -> list:
+    return list(_load_stations_cached(_stations_path(path)))
+
+
+@functools.lru_cache(maxsize=4)
+def _load_stations_np(path: str):
+    """(stations, lat_rad, lon_rad, cos_lat): station dicts plus float64 coordinate arrays, parsed once per path."""
+    stations = _load_stations_cached(path)
+    lat_rad = np.radians(np.array([s["lat"] for s in stations], dtype=np.float64))
+    lon_rad = np.radians(np.array([s["lon"] for s in stations], dtype=np.float64))
+    return stations, lat_rad, lon_rad, np.cos(lat_rad)
+
+
+@functools.lru_cache(maxsize=4)
+def _station_tree(path: str):
+    """BallTree (haversine metric) over the stations, or None without scikit-learn / station data."""
+    stations, lat_rad, lon_rad, _ = _load_stations_np(path)
+    if not stations:
+        return None
+    try:
+        from sklearn.neighbors import BallTree
+    except ImportError:
+        return None
+    return BallTree(np.column_stack((lat_rad, lon_rad)), metric="haversine", leaf_size=40)
+
+
+def _nearest(path: str, lat_deg: np.ndarray, lon_deg: np.ndarray):
+    """(indices, km): nearest station for each point. BallTree when available, else brute-force NumPy."""
+    _, lat_rad, lon_rad, cos_lat = _load_stations_np(path)
+    phi = np.radians(lat_deg)
+    lam = np.radians(lon_deg)
+    tree = _station_tree(path)
+    if tree is not None:
+        dist, idx = tree.query(np.column_stack((phi, lam)), k=1)
+        return idx[:, 0], dist[:, 0] * EARTH_RADIUS_KM
+    # (points x stations) haversine matrix, then argmin per row
+    km = _haversine_rad(phi[:, None], lam[:, None], lat_rad[None, :], lon_rad[None, :], cos_lat[None, :])
+    idx = km.argmin(axis=1)
+    return idx, km[np.arange(len(idx)), idx]
+
+
+def _no_station_data() -> Dict[str, Any]:
+    return {
+        "nearest_station": None,
+        "station_code": None,
+        "station_proximity_km": None,
+        "railway_context": "Station data not available.",
+    }
 
 
 def get_nearest_station(latitude: float, longitude: float, stations_path: Optional[str] = None) -> Dict[str, Any]:
@@ -36,28 +115,60 @@ def get_nearest_station(latitude: float, longitude: float, stations_path: Option
     Find nearest railway station and return railway context.
     Returns: nearest_station_name, station_code, distance_km, railway_context (description).
     """
-    stations = _load_stations(stations_path)
+    if stations_path is None and STATION_LOOKUP == "db":
+        ctx = _nearest_station_db(latitude, longitude)
+        if ctx is not None:
+            return ctx
+    path = _stations_path(stations_path)
+    stations = _load_stations_np(path)[0]
+    if not stations:
+        return _no_station_data()
+    idx, km = _nearest(path, np.array([latitude], dtype=np.float64), np.array([longitude], dtype=np.float64))
+    return _station_context(stations[int(idx[0])], float(km[0]))
+
+
+def _nearest_station_db(latitude: float, longitude: float) -> Optional[Dict[str, Any]]:
+    """
+    KNN on the PostgreSQL stations table: <-> on ll_to_earth() uses the GiST index from init-db.
+    Returns None (caller falls back to the in-process lookup) off PostgreSQL or on error.
+    """
+    from sqlalchemy import text
+    from extensions import db
+
+    if db.engine.dialect.name != "postgresql":
+        return None
+    try:
+        row = db.session.execute(text(
+            "SELECT name, code, earth_distance(ll_to_earth(lat, lon), ll_to_earth(:lat, :lon)) / 1000.0 AS km "
+            "FROM stations ORDER BY ll_to_earth(lat, lon) <-> ll_to_earth(:lat, :lon) LIMIT 1"
+        ), {"lat": latitude, "lon": longitude}).first()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("Station lookup in database failed: %s", e)
+        return None
+    if row is None:
+        return None
+    return _station_context({"name": row.name, "code": row.code}, float(row.km))
+
+
+def get_nearest_stations_batch(latlons, stations_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Nearest station for many points at once (map / heatmap analytics).
+    latlons: (N, 2) array-like of [latitude, longitude] in degrees. Returns one dict per point,
+    same shape as get_nearest_station.
+    """
+    path = _stations_path(stations_path)
+    stations = _load_stations_np(path)[0]
+    pts = np.asarray(latlons, dtype=np.float64).reshape(-1, 2)
     if not stations:
-        return {
-            "nearest_station": None,
-            "station_code": None,
-            "station_proximity_km": None,
-            "railway_context": "Station data not available.",
-        }
-    best = None
-    best_km = float("inf")
-    for s in stations:
-        km = haversine_km(latitude, longitude, s["lat"], s["lon"])
-        if km < best_km:
-            best_km = km
-            best = s
-    if best is None:
-        return {
-            "nearest_station": None,
-            "station_code": None,
-            "station_proximity_km": None,
-            "railway_context": "No station found.",
-        }
+        return [_no_station_data() for _ in range(len(pts))]
+    if not len(pts):
+        return []
+    idx, km = _nearest(path, pts[:, 0], pts[:, 1])
+    return [_station_context(stations[int(i)], float(d)) for i, d in zip(idx, km)]
+
+
+def _station_context(best: Dict[str, Any], best_km: float) -> Dict[str, Any]:
     # Describe proximity
     if best_km < 0.5:
         segment = "at or very close to station premises"
@@ -84,10 +195,13 @@ def build_location_record(
     longitude: float,
     accuracy_m: Optional[float] = None,
     stations_path: Optional[str] = None,
+    captured_at: Optional[datetime] = None,
 ) -> Dict[str, Any]:
     """
     Build a dict suitable for ComplaintLocation: lat, lon, accuracy_m,
     nearest_station, station_proximity_km, railway_context, captured_at.
+    captured_at stays None unless the client supplied it; the insert (or the column's
+    server default) stamps it otherwise.
     """
     ctx = get_nearest_station(latitude, longitude, stations_path)
     return {
@@ -97,5 +211,5 @@ def build_location_record(
         "nearest_station": ctx["nearest_station"],
         "station_proximity_km": ctx["station_proximity_km"],
         "railway_context": ctx["railway_context"],
-        "captured_at": datetime.utcnow(),
+        "captured_at": captured_at,
     }
@@ -4,61 +4,144 @@ Uses ml/predict when model exists; returns category and confidence for complaint
 """
 import os
 import sys
+import logging
+import threading
 
 # Add project root so ml.predict can be imported
 _project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 if _project_root not in sys.path:
     sys.path.insert(0, _project_root)
 
+logger = logging.getLogger(__name__)
+
 _model_cache = None  # (model, class_names, class_indices)
 
+# ML_MICROBATCH=1: coalesce concurrent predict_issue_from_image calls into batched forward
+# passes (ml.predict.InferenceBatcher); worth it on GPU / many uploads per second.
+ML_MICROBATCH = os.getenv("ML_MICROBATCH") == "1"
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def _model_paths():
+    from ml.predict import MODEL_PATH, CLASSES_PATH
+    from config import ML_MODEL_PATH, ML_CLASSES_PATH
+    model_path = ML_MODEL_PATH if os.path.exists(ML_MODEL_PATH) else MODEL_PATH
+    classes_path = ML_CLASSES_PATH if os.path.exists(ML_CLASSES_PATH) else CLASSES_PATH
+    return model_path, classes_path
+
+
+def _model_files_present():
+    """Cheap file check (no TF import): class map plus any model format ml.predict can load."""
+    try:
+        model_path, classes_path = _model_paths()
+    except Exception:
+        return False
+    base = os.path.splitext(model_path)[0]
+    candidates = (model_path, base + ".keras", base + ".onnx", base + ".int8.onnx", base + ".plan")
+    return os.path.exists(classes_path) and any(os.path.exists(p) for p in candidates)
+
+
+# False when no trained model is deployed (or it failed to load): callers skip straight to Gemini
+ML_MODEL_AVAILABLE = _model_files_present()
+
 
 def _load_model():
-    global _model_cache
+    global _model_cache, ML_MODEL_AVAILABLE
     if _model_cache is not None:
         return _model_cache
+    if not ML_MODEL_AVAILABLE:
+        return None
     try:
-        from ml.predict import load_model_and_classes, MODEL_PATH, CLASSES_PATH
-        from config import ML_MODEL_PATH, ML_CLASSES_PATH
-        model_path = ML_MODEL_PATH if os.path.exists(ML_MODEL_PATH) else MODEL_PATH
-        classes_path = ML_CLASSES_PATH if os.path.exists(ML_CLASSES_PATH) else CLASSES_PATH
-        model, class_names, class_indices = load_model_and_classes(model_path, classes_path)
+        from ml.predict import _get_model
+        model, class_names, class_indices = _get_model(*_model_paths())
         if model is not None:
             _model_cache = (model, class_names, class_indices)
+        else:
+            ML_MODEL_AVAILABLE = False
         return _model_cache
     except Exception as e:
-        print(f"[WARN] ML model load failed: {e}")
+        logger.warning("ML model load failed: %s", e)
+        ML_MODEL_AVAILABLE = False
         return None
 
 
-def predict_issue_from_image(image_bytes: bytes) -> dict:
+def warmup_ml():
+    """Load and warm up the EfficientNet model so the first request doesn't pay for it."""
+    return _load_model() is not None
+
+
+def _get_batcher(model, class_names):
+    """Started lazily in the serving process (not at import: gunicorn --preload forks after import)."""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                from ml.predict import InferenceBatcher
+                _batcher = InferenceBatcher(model, class_names)
+    return _batcher
+
+
+def predict_issue_from_image(image) -> dict:
     """
-    Run EfficientNet on image bytes. Returns:
+    Run EfficientNet on image bytes or a binary file object (e.g. the upload stream). Returns:
     - issue_category: class name (e.g. crowd, trash, food)
     - confidence: float 0-1
-    - all_probs: dict class -> probability
+    - probs: per-class probability ndarray (or None), aligned with class_names
+    - class_names: model class names
     - model_used: 'efficientnet' or None if failed
     """
     loaded = _load_model()
     if loaded is None:
-        return {"issue_category": None, "confidence": 0.0, "all_probs": {}, "model_used": None}
+        return {"issue_category": None, "confidence": 0.0, "probs": None, "class_names": [], "model_used": None}
     model, class_names, _ = loaded
     try:
-        from ml.predict import predict, preprocess_image
-        # preprocess_image accepts bytes
-        category, confidence, probs = predict(image_bytes, model=model, class_names=class_names)
+        if ML_MICROBATCH:
+            category, confidence, probs = _get_batcher(model, class_names).submit(image).result()
+        else:
+            from ml.predict import predict
+            # predict accepts bytes or a file object
+            category, confidence, probs = predict(image, model=model, class_names=class_names)
     except Exception as e:
-        print(f"[WARN] ML predict failed: {e}")
-        return {"issue_category": None, "confidence": 0.0, "all_probs": {}, "model_used": "efficientnet"}
+        logger.warning("ML predict failed: %s", e)
+        return {"issue_category": None, "confidence": 0.0, "probs": None, "class_names": class_names, "model_used": "efficientnet"}
     # Map EfficientNet class names to display/priority (optional)
     return {
         "issue_category": category,
-        "confidence": float(confidence),
-        "all_probs": probs,
+        "confidence": confidence,
+        "probs": probs,
+        "class_names": class_names,
         "model_used": "efficientnet",
     }
 
 
+def predict_issues_from_images(image_inputs: list) -> list:
+    """
+    Batched EfficientNet inference (file paths, bytes or binary file objects). Returns one dict per input,
+    same shape as predict_issue_from_image.
+    """
+    loaded = _load_model()
+    if loaded is None:
+        return [{"issue_category": None, "confidence": 0.0, "probs": None, "class_names": [], "model_used": None} for _ in image_inputs]
+    model, class_names, _ = loaded
+    try:
+        from ml.predict import predict_many
+        predictions = predict_many(image_inputs, model=model, class_names=class_names)
+    except Exception as e:
+        logger.warning("ML batch predict failed: %s", e)
+        return [{"issue_category": None, "confidence": 0.0, "probs": None, "class_names": class_names, "model_used": "efficientnet"} for _ in image_inputs]
+    return [
+        {
+            "issue_category": category,
+            "confidence": confidence,
+            "probs": probs,
+            "class_names": class_names,
+            "model_used": "efficientnet",
+        }
+        for category, confidence, probs in predictions
+    ]
+
+
 def map_effnet_to_department(category: str) -> str:
     """Map EfficientNet class to suggested department."""
     m = {
@@ -5,8 +5,12 @@ from ticket image or PDF using EasyOCR (primary) or Tesseract (fallback).
 import os
 import re
 import io
+import threading
 from typing import Dict, Any, Optional
 
+import numpy as np
+from PIL import Image
+
 # Optional: PDF to image
 try:
     from pdf2image import convert_from_bytes
@@ -22,34 +26,68 @@ except ImportError:
 
 try:
     import pytesseract
-    from PIL import Image
     HAS_TESSERACT = True
 except ImportError:
     HAS_TESSERACT = False
 
 
+# Printed tickets stay readable at this long side; OCR time scales with pixel count
+OCR_MAX_SIDE = 1600
+PDF_DPI = 200
+
+
 def _image_from_file(file_data: bytes, filename: str) -> Optional[Any]:
-    """Return PIL Image from file bytes (image or first page of PDF)."""
+    """Return a grayscale PIL Image (long side <= OCR_MAX_SIDE) from file bytes (image or first page of PDF)."""
     ext = (filename or "").lower().split(".")[-1]
     if ext == "pdf":
         if not HAS_PDF2IMAGE:
             return None
-        pages = convert_from_bytes(file_data, first_page=1, last_page=1)
-        return pages[0] if pages else None
+        pages = convert_from_bytes(file_data, dpi=PDF_DPI, first_page=1, last_page=1, grayscale=True)
+        if not pages:
+            return None
+        img = pages[0]
+    else:
+        try:
+            img = Image.open(io.BytesIO(file_data))
+            img.draft("L", (OCR_MAX_SIDE, OCR_MAX_SIDE))  # JPEG: decode at reduced scale
+        except Exception:
+            return None
     try:
-        return Image.open(io.BytesIO(file_data)).convert("RGB")
+        img = img.convert("L")
+        img.thumbnail((OCR_MAX_SIDE, OCR_MAX_SIDE), Image.LANCZOS)
     except Exception:
         return None
+    return img
+
+
+# One EasyOCR Reader per process (~500MB of weights); the lock keeps concurrent first
+# requests from each building one.
+_reader = None
+_reader_lock = threading.Lock()
+
+
+def _cuda_available() -> bool:
+    try:
+        import torch  # EasyOCR depends on torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+
+def _get_reader():
+    global _reader
+    if _reader is None:
+        with _reader_lock:
+            if _reader is None:
+                _reader = easyocr.Reader(["en"], gpu=_cuda_available(), verbose=False)
+    return _reader
 
 
 def _ocr_easyocr(image) -> str:
     if not HAS_EASYOCR:
         return ""
-    reader = getattr(_ocr_easyocr, "_reader", None)
-    if reader is None:
-        reader = easyocr.Reader(["en"], gpu=False, verbose=False)
-        _ocr_easyocr._reader = reader
-    result = reader.readtext(image)
+    # ndarray input skips EasyOCR's own PIL -> numpy conversion
+    result = _get_reader().readtext(np.asarray(image))
     return " ".join([r[1] for r in result])
 
 
@@ -78,10 +116,25 @@ def extract_text(file_data: bytes, filename: str, engine: Optional[str] = None)
     return text
 
 
-# Regex patterns for Indian railway ticket text (common formats)
-PATTERN_TRAIN_NUMBER = re.compile(r"\b(\d{5})\b|\b(\d{4})\b")  # 5 or 4 digit train number
-PATTERN_COACH = re.compile(r"(?:Coach|COACH|Bogie|BOGIE|Compartment)\s*[:\-#]?\s*([A-Z0-9\-]+)", re.I)
-PATTERN_SEAT = re.compile(r"(?:Seat|SEAT|Berth|BERTH|No\.?)\s*[:\-#]?\s*([A-Z0-9\-/]+)", re.I)
+# Regex patterns for Indian railway ticket text (common formats), merged into one scanner.
+# Each field is a zero-width lookahead, so fields never consume each other's text
+# (e.g. "No: 12345" is both a seat match and a train-number match) and one finditer pass
+# over the text finds every field's first occurrence.
+PATTERN_TICKET_FIELDS = re.compile(
+    r"""
+    (?=(?P<route>
+        (?:From|Boarding) \s*[:\-]?\s* (?P<route_from>[A-Za-z\s]+?)
+        \s+ (?:To|Destination|Dest) \s*[:\-]?\s* (?P<route_to>[A-Za-z\s]+?) (?:\s|$|Train)
+    ))
+    | (?=(?P<coach> (?:Coach|Bogie|Compartment) \s*[:\-\#]?\s* (?P<coach_no>[A-Z0-9\-]+) ))
+    | (?=(?P<seat> (?:Seat|Berth|No\.?) \s*[:\-\#]?\s* (?P<seat_no>[A-Z0-9\-/]+) ))
+    | (?=(?P<train_no> \b\d{4,5}\b ))  # 5 (IR format) or 4 digit train number
+    """,
+    re.I | re.VERBOSE,
+)
+# Train name right after the train number, e.g. "12345 Rajdhani Express"
+PATTERN_TRAIN_NAME = re.compile(r"\s+([A-Za-z\s]+(?:Express|Mail|Superfast|Special|Local)?)", re.I)
+PATTERN_WORD_CHAR = re.compile(r"\w")
 PATTERN_STATION = re.compile(r"[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\s+(?:Junction|Jn|Central|Jn\.|Terminus|Jct)?")
 
 
@@ -99,39 +152,41 @@ def parse_train_details(raw_text: str) -> Dict[str, Any]:
         "boarding_station": None,
         "destination_station": None,
     }
-    # Train number: often 5 digits (IR format)
-    nums = PATTERN_TRAIN_NUMBER.findall(text)
-    if nums:
-        for n in nums:
-            num = n[0] or n[1]
-            if num and len(num) >= 4:
-                result["train_number"] = num
-                break
-    # Coach
-    m = PATTERN_COACH.search(text)
-    if m:
-        result["coach_number"] = m.group(1).strip()
-    # Seat
-    m = PATTERN_SEAT.search(text)
-    if m:
-        result["seat_number"] = m.group(1).strip()
-    # Stations: look for "From X To Y" or "Boarding X Destination Y" or station names
-    from_to = re.search(r"(?:From|FROM|Boarding)\s*[:\-]?\s*([A-Za-z\s]+?)\s+(?:To|TO|Destination|Dest)\s*[:\-]?\s*([A-Za-z\s]+?)(?:\s|$|Train)", text, re.I)
-    if from_to:
-        result["boarding_station"] = from_to.group(1).strip()
-        result["destination_station"] = from_to.group(2).strip()
-    # Train name: often after train number, e.g. "12345 Rajdhani Express"
+    seen = set()
+    for m in PATTERN_TICKET_FIELDS.finditer(text):
+        key = m.lastgroup
+        if key in seen:
+            continue
+        seen.add(key)
+        if key == "train_no":
+            result["train_number"] = m.group("train_no")
+        elif key == "coach":
+            result["coach_number"] = m.group("coach_no").strip()
+        elif key == "seat":
+            result["seat_number"] = m.group("seat_no").strip()
+        else:
+            # Stations: "From X To Y" or "Boarding X Destination Y"
+            result["boarding_station"] = m.group("route_from").strip()
+            result["destination_station"] = m.group("route_to").strip()
+        if len(seen) == 4:
+            break
     if result["train_number"]:
-        name_match = re.search(
-            r"\b" + re.escape(result["train_number"]) + r"\s+([A-Za-z\s]+(?:Express|Mail|Superfast|Special|Local)?)",
-            text,
-            re.I,
-        )
-        if name_match:
-            result["train_name"] = name_match.group(1).strip()
+        result["train_name"] = _train_name_after(text, result["train_number"])
     return result
 
 
+def _train_name_after(text: str, number: str) -> Optional[str]:
+    """Name after the first occurrence of the train number (at a word start) that is followed by one."""
+    start = text.find(number)
+    while start != -1:
+        if start == 0 or not PATTERN_WORD_CHAR.match(text, start - 1):
+            name_match = PATTERN_TRAIN_NAME.match(text, start + len(number))
+            if name_match:
+                return name_match.group(1).strip()
+        start = text.find(number, start + 1)
+    return None
+
+
 def extract_train_details_from_ticket(file_data: bytes, filename: str) -> Dict[str, Any]:
     """
     Full pipeline: OCR + parse. Returns structured train details and raw_ocr_text.
@@ -0,0 +1,60 @@
+"""
+Shared fixtures: the Flask app on a throwaway SQLite database, seeded the same way as
+`flask init-db` (guest user plus an admin from ADMIN_EMAIL).
+"""
+import os
+import sys
+import tempfile
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+# Config reads these at import time, so set them before anything imports the app
+_DB_DIR = tempfile.mkdtemp(prefix="railway-tests-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_DB_DIR, "test.db")
+os.environ["UPLOAD_FOLDER"] = os.path.join(_DB_DIR, "uploads")
+os.environ["ADMIN_EMAIL"] = "admin@test.local"
+os.environ["JWT_SECRET_KEY"] = "test-secret-key-of-at-least-32-bytes"
+os.environ.pop("FLASK_AUTO_INIT_DB", None)
+os.environ.pop("ML_PRELOAD", None)
+
+import pytest
+
+ADMIN_EMAIL = os.environ["ADMIN_EMAIL"]
+ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin")
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import app as flask_app, _init_db
+
+    flask_app.config["TESTING"] = True
+    with flask_app.app_context():
+        _init_db()
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def app_ctx(app):
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def guest_id(app_ctx):
+    from config import GUEST_EMAIL
+    from models import User
+
+    return User.query.filter_by(email=GUEST_EMAIL).one().id
+
+
+@pytest.fixture
+def admin_headers(client):
+    r = client.post("/api/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+    assert r.status_code == 200, r.get_json()
+    return {"Authorization": "Bearer " + r.get_json()["accessToken"]}
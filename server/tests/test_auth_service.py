@@ -0,0 +1,44 @@
+"""decode_token caches verified payloads in a TLRU cache; entries must not outlive the token."""
+import time
+from datetime import timedelta
+
+import pytest
+
+from services import auth_service
+from services.auth_service import create_access_token, decode_token
+
+
+@pytest.fixture(autouse=True)
+def _empty_token_cache():
+    auth_service._TOKEN_CACHE.clear()
+    yield
+    auth_service._TOKEN_CACHE.clear()
+
+
+def test_decode_token_serves_cached_payload():
+    token = create_access_token(1, "a@test.local", "user")
+    first = decode_token(token)
+    assert first["sub"] == "1" and first["type"] == "access"
+    assert decode_token(token) is first
+
+
+def test_decode_token_cache_entry_expires_after_ttl(monkeypatch):
+    monkeypatch.setattr(auth_service, "TOKEN_CACHE_TTL", 0.05)
+    token = create_access_token(1, "a@test.local", "user")
+    first = decode_token(token)
+    assert decode_token(token) is first
+    time.sleep(0.1)
+    again = decode_token(token)
+    assert again == first and again is not first
+
+
+def test_decode_token_rejects_expired_token_even_if_cached():
+    token = create_access_token(1, "a@test.local", "user", expires_delta=timedelta(seconds=1))
+    assert decode_token(token) is not None
+    time.sleep(1.1)
+    assert decode_token(token) is None
+
+
+def test_decode_token_does_not_cache_invalid_tokens():
+    assert decode_token("not-a-jwt") is None
+    assert len(auth_service._TOKEN_CACHE) == 0
@@ -0,0 +1,52 @@
+"""Input validation on POST /api/complaint/submit (rejected before any analysis runs)."""
+import io
+
+from PIL import Image
+
+from config import MAX_CONTENT_LENGTH as MAX_FILE_SIZE
+
+SUBMIT = "/api/complaint/submit"
+
+
+def _png_bytes():
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8), "red").save(buf, "PNG")
+    return buf.getvalue()
+
+
+def test_submit_rejects_oversized_body(client):
+    r = client.post(SUBMIT, data=b"\0" * (MAX_FILE_SIZE + 1), content_type="application/octet-stream")
+    assert r.status_code == 413
+
+
+def test_submit_requires_image(client):
+    r = client.post(SUBMIT, data={"text": "dirty coach"}, content_type="multipart/form-data")
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "Image file is required"
+
+
+def test_submit_rejects_empty_filename(client):
+    r = client.post(SUBMIT, data={"image": (io.BytesIO(b""), "")}, content_type="multipart/form-data")
+    assert r.status_code == 400
+
+
+def test_submit_rejects_disallowed_extension(client):
+    r = client.post(SUBMIT, data={"image": (io.BytesIO(_png_bytes()), "photo.exe")},
+                    content_type="multipart/form-data")
+    assert r.status_code == 400
+    assert r.get_json()["error"].startswith("Only image files allowed")
+
+
+def test_submit_rejects_corrupted_image(client):
+    truncated = _png_bytes()[:20]
+    r = client.post(SUBMIT, data={"image": (io.BytesIO(truncated), "photo.png")},
+                    content_type="multipart/form-data")
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "Invalid or corrupted image file"
+
+
+def test_submit_rejects_non_image_with_image_extension(client):
+    r = client.post(SUBMIT, data={"image": (io.BytesIO(b"GIF89a but not really"), "photo.gif")},
+                    content_type="multipart/form-data")
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "Invalid or corrupted image file"
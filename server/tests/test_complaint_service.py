@@ -0,0 +1,116 @@
+"""Complaint creation (ID collision retry) and keyset pagination."""
+import json
+import secrets
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Complaint
+from services import complaint_service
+from services.complaint_service import (
+    create_complaint,
+    get_all_complaints,
+    get_all_complaints_json,
+    get_complaint_by_id,
+)
+
+
+def _analysis(category="Cleanliness"):
+    return {
+        "issue_category": category,
+        "issue_details": "test",
+        "priority": "low",
+        "department": "Housekeeping",
+        "complaint_description": "test complaint",
+    }
+
+
+def test_create_complaint_retries_on_duplicate_id(guest_id, monkeypatch):
+    existing = create_complaint(guest_id, _analysis())
+    fresh = f"RM-TEST-{secrets.token_hex(3).upper()}"
+    ids = iter([existing.complaint_id, fresh])
+    monkeypatch.setattr(complaint_service, "generate_complaint_id", lambda: next(ids))
+
+    complaint = create_complaint(guest_id, _analysis())
+    assert complaint.complaint_id == fresh
+    assert get_complaint_by_id(fresh).id == complaint.id
+    assert get_complaint_by_id(existing.complaint_id).id == existing.id
+
+
+def test_create_complaint_gives_up_after_repeated_collisions(guest_id, monkeypatch):
+    existing = create_complaint(guest_id, _analysis())
+    calls = []
+    monkeypatch.setattr(complaint_service, "generate_complaint_id",
+                        lambda: calls.append(1) or existing.complaint_id)
+
+    with pytest.raises(IntegrityError):
+        create_complaint(guest_id, _analysis())
+    assert len(calls) == complaint_service._ID_ATTEMPTS
+    # The failed attempts were rolled back; the session is still usable
+    assert get_complaint_by_id(existing.complaint_id) is not None
+
+
+@pytest.fixture
+def paging_category(guest_id):
+    """Seven complaints in their own category; four share one created_at so the id breaks ties."""
+    category = f"Paging {secrets.token_hex(4)}"
+    created = [create_complaint(guest_id, _analysis(category)) for _ in range(7)]
+    tied = [c.id for c in created[1:5]]
+    db.session.execute(
+        update(Complaint).where(Complaint.id.in_(tied)).values(created_at=datetime(2026, 1, 1, 12, 0, 0))
+    )
+    db.session.commit()
+    return category
+
+
+def _expected_order(category):
+    rows = Complaint.query.filter_by(issue_category=category).all()
+    assert len(rows) == 7
+    return [c.id for c in sorted(rows, key=lambda c: (c.created_at, c.id), reverse=True)]
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 7, 10])
+def test_get_all_complaints_cursor_walk(paging_category, page_size):
+    seen, after = [], None
+    while True:
+        page = get_all_complaints(issue_type=paging_category, limit=page_size, after=after)
+        seen.extend(c.id for c in page)
+        if len(page) < page_size:
+            break
+        after = (page[-1].created_at, page[-1].id)
+    assert seen == _expected_order(paging_category)
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 7, 10])
+def test_get_all_complaints_json_cursor_walk(paging_category, page_size):
+    seen, after = [], None
+    while True:
+        rows, last = get_all_complaints_json(issue_type=paging_category, limit=page_size, after=after)
+        seen.extend(json.loads(r)["id"] for r in rows)
+        if len(rows) < page_size:
+            break
+        assert isinstance(last[0], datetime)
+        after = last
+    assert seen == _expected_order(paging_category)
+
+
+def test_admin_list_next_cursor_round_trip(client, admin_headers, paging_category):
+    seen, cursor = [], None
+    while True:
+        params = {"issue_type": paging_category, "limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/api/admin/complaints", query_string=params, headers=admin_headers).get_json()
+        seen.extend(c["id"] for c in body["complaints"])
+        cursor = body["nextCursor"]
+        if cursor is None:
+            break
+    assert seen == _expected_order(paging_category)
+
+
+def test_admin_list_rejects_bad_cursor(client, admin_headers):
+    r = client.get("/api/admin/complaints?cursor=yesterday,abc", headers=admin_headers)
+    assert r.status_code == 400
@@ -0,0 +1,89 @@
+"""
+parse_train_details scans ticket fields in one pass (PATTERN_TICKET_FIELDS) and finds the
+train name with _train_name_after; it must agree with the original per-field regexes.
+"""
+import random
+import re
+
+import pytest
+
+from services.ocr_service import parse_train_details
+
+# Original implementation, kept verbatim as the reference
+LEGACY_TRAIN_NUMBER = re.compile(r"\b(\d{5})\b|\b(\d{4})\b")
+LEGACY_COACH = re.compile(r"(?:Coach|COACH|Bogie|BOGIE|Compartment)\s*[:\-#]?\s*([A-Z0-9\-]+)", re.I)
+LEGACY_SEAT = re.compile(r"(?:Seat|SEAT|Berth|BERTH|No\.?)\s*[:\-#]?\s*([A-Z0-9\-/]+)", re.I)
+
+
+def legacy_parse_train_details(raw_text):
+    text = raw_text.replace("\n", " ").replace("\r", " ")
+    result = {
+        "train_number": None,
+        "train_name": None,
+        "coach_number": None,
+        "seat_number": None,
+        "boarding_station": None,
+        "destination_station": None,
+    }
+    nums = LEGACY_TRAIN_NUMBER.findall(text)
+    if nums:
+        for n in nums:
+            num = n[0] or n[1]
+            if num and len(num) >= 4:
+                result["train_number"] = num
+                break
+    m = LEGACY_COACH.search(text)
+    if m:
+        result["coach_number"] = m.group(1).strip()
+    m = LEGACY_SEAT.search(text)
+    if m:
+        result["seat_number"] = m.group(1).strip()
+    from_to = re.search(r"(?:From|FROM|Boarding)\s*[:\-]?\s*([A-Za-z\s]+?)\s+(?:To|TO|Destination|Dest)\s*[:\-]?\s*([A-Za-z\s]+?)(?:\s|$|Train)", text, re.I)
+    if from_to:
+        result["boarding_station"] = from_to.group(1).strip()
+        result["destination_station"] = from_to.group(2).strip()
+    if result["train_number"]:
+        name_match = re.search(
+            r"\b" + re.escape(result["train_number"]) + r"\s+([A-Za-z\s]+(?:Express|Mail|Superfast|Special|Local)?)",
+            text,
+            re.I,
+        )
+        if name_match:
+            result["train_name"] = name_match.group(1).strip()
+    return result
+
+
+SAMPLES = [
+    "",
+    "PNR 4521367890\nTrain No: 12951 Mumbai Rajdhani Express\nFrom: Mumbai Central To: New Delhi\nCoach: B2 Seat: 45",
+    "12002 Shatabdi Express Coach C3 Berth 21/UB From Bhopal To Delhi Train",
+    "Boarding Howrah Destination Puri Bogie S5 No. 7",
+    "TRAIN 1234 local Compartment - GS SEAT # 12/LB",
+    "From 1234 12345 1234 Seat Destination No: Mail",
+    "x1234 _1234 1234_ é1234 123456 2345 Special",
+    "coach:b-2 seat:-/ from delhi to agra",
+]
+
+TOKENS = [
+    "From", "To", "Boarding", "Destination", "Dest", "Train", "Coach", "Bogie", "Seat", "Berth",
+    "No:", "No.", "Mail", "Express", "Local", "1234", "12345", "123456", "x1234", "B2", "S5",
+    "45/UB", "-", ":", "#", "Delhi", "Mumbai Central", "\n", "_1234", "1234_", "é1234",
+]
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_parse_train_details_matches_legacy_on_samples(text):
+    assert parse_train_details(text) == legacy_parse_train_details(text)
+
+
+def test_parse_train_details_train_name_across_repeated_numbers():
+    details = parse_train_details("From 1234 12345 1234 Seat Destination No: Mail")
+    assert details["train_number"] == "1234"
+    assert details["train_name"] == "Seat Destination No"
+
+
+def test_parse_train_details_matches_legacy_on_random_text():
+    rng = random.Random(1)
+    for _ in range(5000):
+        text = " ".join(rng.choice(TOKENS) for _ in range(rng.randint(1, 9)))
+        assert parse_train_details(text) == legacy_parse_train_details(text), repr(text)
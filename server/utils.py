@@ -0,0 +1,11 @@
+"""
+Small helpers shared by the route modules.
+"""
+
+
+def allowed_extension(filename, allowed) -> bool:
+    """True if filename has an extension (case-insensitive) in the frozenset `allowed`."""
+    if not filename:
+        return False
+    _, dot, ext = filename.rpartition(".")
+    return bool(dot) and ext.lower() in allowed